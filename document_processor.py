@@ -4,14 +4,18 @@ Multi-format document processor for RAG applications.
 Supports PDF, DOCX, TXT, MD, and Excel files.
 """
 
+import io
+import itertools
 import os
 import re
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Tuple, Optional
 from pathlib import Path
 
 try:
-    import PyPDF2
-    PDF_AVAILABLE = True
+    import pypdf
+    PDF_AVAILABLE = hasattr(pypdf, "PdfReader")
 except ImportError:
     PDF_AVAILABLE = False
 
@@ -21,11 +25,36 @@ try:
 except ImportError:
     DOCX_AVAILABLE = False
 
+try:
+    from lxml import etree
+except ImportError:
+    import xml.etree.ElementTree as etree
+
+try:
+    from python_calamine import CalamineWorkbook
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
 try:
     import pandas as pd
-    EXCEL_AVAILABLE = True
+    PANDAS_AVAILABLE = True
 except ImportError:
-    EXCEL_AVAILABLE = False
+    PANDAS_AVAILABLE = False
+
+EXCEL_AVAILABLE = CALAMINE_AVAILABLE or OPENPYXL_AVAILABLE or PANDAS_AVAILABLE
+
+# Patterns used by clean_text, compiled once at import
+_RE_WS = re.compile(r'\s+')
+_RE_SHEET = re.compile(r'--- Sheet: .*? ---')
+_RE_BULLET = re.compile(r'^\s*[•\-\*]\s*', re.MULTILINE)
+_RE_BLANK = re.compile(r'\n\s*\n')
 
 class DocumentProcessor:
     """Handles multiple document formats and extracts text content."""
@@ -85,20 +114,21 @@ class DocumentProcessor:
     def _extract_pdf(self, file_path: str) -> Tuple[str, Dict]:
         """Extract text from PDF files."""
         if not PDF_AVAILABLE:
-            raise ImportError("PyPDF2 is required for PDF processing. Install with: pip install PyPDF2")
+            raise ImportError("pypdf is required for PDF processing. Install with: pip install pypdf")
         
-        text_parts = []
+        buf = io.StringIO()
         metadata = {"format": "pdf"}
         
         try:
             with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
+                pdf_reader = pypdf.PdfReader(file)
                 metadata["pages"] = len(pdf_reader.pages)
                 
-                for page_num, page in enumerate(pdf_reader.pages):
+                for page in pdf_reader.pages:
                     page_text = page.extract_text()
-                    if page_text.strip():
-                        text_parts.append(f"--- Page {page_num + 1} ---\n{page_text}")
+                    if page_text and page_text.strip():
+                        buf.write(page_text)
+                        buf.write("\n\n")
                 
                 # Extract PDF metadata
                 if pdf_reader.metadata:
@@ -113,10 +143,24 @@ class DocumentProcessor:
         except Exception as e:
             raise ValueError(f"Error processing PDF {file_path}: {str(e)}")
         
-        return "\n\n".join(text_parts), metadata
+        return buf.getvalue(), metadata
     
     def _extract_docx(self, file_path: str) -> Tuple[str, Dict]:
-        """Extract text from DOCX files."""
+        """Extract text from DOCX files by streaming word/document.xml."""
+        try:
+            with zipfile.ZipFile(file_path) as docx_zip:
+                with docx_zip.open("word/document.xml") as document_xml:
+                    text = _docx_stream_text(document_xml)
+                metadata = {"format": "docx", **_docx_core_properties(docx_zip)}
+            return text, metadata
+        
+        except Exception as e:
+            if not DOCX_AVAILABLE:
+                raise ValueError(f"Error processing DOCX {file_path}: {str(e)}")
+            return self._extract_docx_object_model(file_path)
+    
+    def _extract_docx_object_model(self, file_path: str) -> Tuple[str, Dict]:
+        """Extract text from DOCX files via python-docx (fallback for odd files)."""
         if not DOCX_AVAILABLE:
             raise ImportError("python-docx is required for DOCX processing. Install with: pip install python-docx")
         
@@ -159,52 +203,167 @@ class DocumentProcessor:
     def _extract_excel(self, file_path: str) -> Tuple[str, Dict]:
         """Extract text from Excel files."""
         if not EXCEL_AVAILABLE:
-            raise ImportError("pandas and openpyxl are required for Excel processing. Install with: pip install pandas openpyxl")
+            raise ImportError("python-calamine or openpyxl is required for Excel processing. Install with: pip install python-calamine")
+        
+        # Without calamine, legacy .xls workbooks can only be read through pandas
+        use_openpyxl = OPENPYXL_AVAILABLE and Path(file_path).suffix.lower() != '.xls'
+        if not CALAMINE_AVAILABLE and not use_openpyxl and not PANDAS_AVAILABLE:
+            raise ImportError("python-calamine or pandas is required for .xls files. Install with: pip install python-calamine")
         
         try:
-            # Read all sheets
-            excel_file = pd.ExcelFile(file_path)
-            text_parts = []
-            metadata = {"format": "excel", "sheets": excel_file.sheet_names}
+            buf = io.StringIO()
             
-            for sheet_name in excel_file.sheet_names:
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
-                if not df.empty:
-                    # Convert DataFrame to text
-                    sheet_text = f"--- Sheet: {sheet_name} ---\n"
-                    sheet_text += df.to_string(index=False)
-                    text_parts.append(sheet_text)
+            # Open the workbook once and stream rows of every sheet into the buffer
+            if CALAMINE_AVAILABLE:
+                workbook = CalamineWorkbook.from_path(file_path)
+                sheet_names = list(workbook.sheet_names)
+                for sheet_name in sheet_names:
+                    _write_sheet(buf, sheet_name, workbook.get_sheet_by_name(sheet_name).to_python())
+            elif use_openpyxl:
+                workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+                try:
+                    sheet_names = list(workbook.sheetnames)
+                    for sheet_name in sheet_names:
+                        _write_sheet(buf, sheet_name, workbook[sheet_name].iter_rows(values_only=True))
+                finally:
+                    workbook.close()
+            else:
+                with pd.ExcelFile(file_path) as excel_file:
+                    sheet_names = excel_file.sheet_names
+                    for sheet_name in sheet_names:
+                        df = excel_file.parse(sheet_name)
+                        if not df.empty:
+                            # Raw values, header first; column alignment is wasted work
+                            rows = itertools.chain([list(df.columns)],
+                                                   df.itertuples(index=False, name=None))
+                            _write_sheet(buf, sheet_name, rows)
             
-            return "\n\n".join(text_parts), metadata
+            return buf.getvalue(), {"format": "excel", "sheets": sheet_names}
         
         except Exception as e:
             raise ValueError(f"Error processing Excel {file_path}: {str(e)}")
     
-    def batch_process(self, folder_path: str) -> List[Tuple[str, str, Dict]]:
+    def list_files(self, folder_path: str) -> List[str]:
         """
-        Process all supported files in a folder.
+        List all supported files under a folder, recursively.
         
         Args:
             folder_path: Path to the folder containing documents
             
         Returns:
-            List of tuples: (file_path, text_content, metadata)
+            List of file paths
         """
-        results = []
         folder = Path(folder_path)
         
         if not folder.exists():
             raise FileNotFoundError(f"Folder not found: {folder_path}")
         
-        for file_path in folder.rglob("*"):
-            if file_path.is_file() and self.can_process(str(file_path)):
+        return [str(p) for p in folder.rglob("*") if p.is_file() and self.can_process(str(p))]
+    
+    def batch_process(self, folder_path: str) -> List[Tuple[str, str, Dict]]:
+        """
+        Process all supported files in a folder.
+        
+        Args:
+            folder_path: Path to the folder containing documents
+            
+        Returns:
+            List of tuples: (file_path, text_content, metadata), with text
+            already passed through clean_text
+        """
+        files = self.list_files(folder_path)
+        if not files:
+            return []
+        
+        # Extraction is dominated by file I/O and independent per-file parsing,
+        # so overlap it across a thread pool and keep the original file order.
+        results = [None] * len(files)
+        max_workers = min(32, (os.cpu_count() or 4) * 4, len(files))
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            futures = {ex.submit(extract_and_clean, path, self): i for i, path in enumerate(files)}
+            for future in as_completed(futures):
+                i = futures[future]
                 try:
-                    text, metadata = self.extract_text(str(file_path))
-                    results.append((str(file_path), text, metadata))
+                    text, metadata = future.result()
+                    results[i] = (files[i], text, metadata)
                 except Exception as e:
-                    print(f"Warning: Could not process {file_path}: {e}")
+                    print(f"Warning: Could not process {files[i]}: {e}")
+        
+        return [r for r in results if r is not None]
+
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_DOCX_CORE_FIELDS = {
+    "{http://purl.org/dc/elements/1.1/}title": "title",
+    "{http://purl.org/dc/elements/1.1/}creator": "author",
+    "{http://purl.org/dc/elements/1.1/}subject": "subject",
+}
+
+def _docx_stream_text(document_xml) -> str:
+    """
+    Stream text out of a DOCX word/document.xml without building the object model.
+    Paragraphs end with a newline; a table row's non-empty cell texts are joined
+    with ' | ', one row per line, as the python-docx extraction does.
+    """
+    buf = io.StringIO()
+    cell_bufs = []  # one buffer per open w:tc; cell text is stripped when it closes
+    row_cells = []  # one list of cell texts per open w:tr
+    for event, elem in etree.iterparse(document_xml, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if tag == _W_NS + "tc":
+                cell_bufs.append(io.StringIO())
+            elif tag == _W_NS + "tr":
+                row_cells.append([])
+            continue
         
-        return results
+        out = cell_bufs[-1] if cell_bufs else buf
+        if tag == _W_NS + "t":
+            out.write(elem.text or "")
+        elif tag == _W_NS + "tab":
+            out.write("\t")
+        elif tag == _W_NS + "br" or tag == _W_NS + "p":
+            out.write("\n")
+        elif tag == _W_NS + "tc":
+            text = cell_bufs.pop().getvalue().strip()
+            if text and row_cells:
+                row_cells[-1].append(text)
+        elif tag == _W_NS + "tr":
+            cells = row_cells.pop()
+            if cells:
+                (cell_bufs[-1] if cell_bufs else buf).write(" | ".join(cells) + "\n")
+        else:
+            continue
+        elem.clear()
+    return buf.getvalue()
+
+def _docx_core_properties(docx_zip: zipfile.ZipFile) -> Dict:
+    """Read title/author/subject from docProps/core.xml, if present."""
+    try:
+        root = etree.fromstring(docx_zip.read("docProps/core.xml"))
+    except KeyError:
+        return {}
+    metadata = {}
+    for child in root:
+        key = _DOCX_CORE_FIELDS.get(child.tag)
+        if key and child.text:
+            metadata[key] = child.text
+    return metadata
+
+def _write_sheet(buf: io.StringIO, sheet_name: str, rows) -> None:
+    """Write a sheet's non-empty rows as tab-separated lines; empty sheets are skipped."""
+    header_written = False
+    for row in rows:
+        # None (openpyxl) and NaN (pandas) are both empty cells
+        cells = ["" if v is None or v != v else str(v) for v in row]
+        if not any(cells):
+            continue
+        if not header_written:
+            buf.write(f"--- Sheet: {sheet_name} ---\n")
+            header_written = True
+        buf.write("\t".join(cells))
+        buf.write("\n")
+    if header_written:
+        buf.write("\n")
 
 def clean_text(text: str) -> str:
     """
@@ -217,20 +376,43 @@ def clean_text(text: str) -> str:
         Cleaned text
     """
     # Remove excessive whitespace
-    text = re.sub(r'\s+', ' ', text)
+    text = _RE_WS.sub(' ', text)
     
-    # Remove page markers
-    text = re.sub(r'--- Page \d+ ---', '', text)
-    text = re.sub(r'--- Sheet: .*? ---', '', text)
+    # Remove sheet markers
+    text = _RE_SHEET.sub('', text)
     
     # Clean up bullet points
-    text = re.sub(r'^\s*[•\-\*]\s*', '• ', text, flags=re.MULTILINE)
+    text = _RE_BULLET.sub('• ', text)
     
     # Remove empty lines
-    text = re.sub(r'\n\s*\n', '\n', text)
+    text = _RE_BLANK.sub('\n', text)
     
     return text.strip()
 
+def extract_and_clean(file_path: str, processor: Optional[DocumentProcessor] = None) -> Tuple[str, Dict]:
+    """
+    Extract and clean a document in one step.
+    
+    A leading YAML front-matter block is kept verbatim so it can still be
+    parsed; only the body is cleaned.
+    
+    Args:
+        file_path: Path to the document file
+        processor: Processor to reuse; a new one is created if omitted
+        
+    Returns:
+        Tuple of (cleaned_text, metadata)
+    """
+    processor = processor or DocumentProcessor()
+    text, metadata = processor.extract_text(file_path)
+    
+    if text.startswith("---"):
+        parts = text.split("---", 2)
+        if len(parts) >= 3:
+            return f"---{parts[1]}---\n{clean_text(parts[2])}", metadata
+    
+    return clean_text(text), metadata
+
 if __name__ == "__main__":
     # Example usage
     processor = DocumentProcessor()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Persistent embedding cache for RAG applications.
+Stores chunk embeddings in SQLite keyed by a hash of (model name, chunk text),
+so re-processing unchanged text only embeds chunks that were never seen before.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import numpy as np
+from typing import Dict, Iterable, List
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "rag-ready", "embeddings.sqlite3")
+
+# Stay well under SQLite's limit on bound parameters per statement
+_LOOKUP_BATCH = 500
+
+def cache_key(model_name: str, text: str) -> bytes:
+    """Return the cache key for ``text`` embedded with ``model_name``."""
+    return hashlib.sha256(f"{model_name}\x1f{text}".encode("utf-8")).digest()
+
+class EmbeddingCache:
+    """SQLite-backed store of float32 embedding vectors."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path: SQLite file to use; parent directories are created
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        # Gradio runs handlers on worker threads; share one connection behind a lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS cache (key BLOB PRIMARY KEY, vec BLOB NOT NULL)")
+
+    def get_many(self, keys: Iterable[bytes]) -> Dict[bytes, np.ndarray]:
+        """Return the cached vectors for whichever of ``keys`` are present."""
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), _LOOKUP_BATCH):
+                batch = keys[i:i + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM cache WHERE key IN ({placeholders})", batch
+                )
+                for key, vec in rows:
+                    found[key] = np.frombuffer(vec, dtype=np.float32)
+        return found
+
+    def put_many(self, vectors: Dict[bytes, np.ndarray]):
+        """Store ``vectors`` (key → embedding), replacing existing entries."""
+        rows = [(key, np.asarray(vec, dtype=np.float32).tobytes()) for key, vec in vectors.items()]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO cache (key, vec) VALUES (?, ?)", rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class CachedEmbeddingGenerator:
+    """Wrap an ``EmbeddingGenerator`` so only uncached texts reach the model."""
+
+    def __init__(self, generator, cache: EmbeddingCache):
+        """
+        Args:
+            generator: Object with ``model_name`` and ``generate_embeddings(texts)``
+            cache: Cache used for lookups and to store new embeddings
+        """
+        self.generator = generator
+        self.cache = cache
+
+    def generate_embeddings(self, texts: List[str], **kwargs) -> np.ndarray:
+        """
+        Generate embeddings for ``texts``, reusing cached vectors.
+
+        Args:
+            texts: List of text strings to embed
+            **kwargs: Passed to the wrapped generator for cache misses
+
+        Returns:
+            numpy array of float32 embeddings, one row per text
+        """
+        if not texts:
+            return np.array([])
+
+        keys = [cache_key(self.generator.model_name, t) for t in texts]
+        found = self.cache.get_many(keys)
+
+        missing = [i for i, k in enumerate(keys) if k not in found]
+        if missing:
+            new = self.generator.generate_embeddings([texts[i] for i in missing], **kwargs)
+            fresh = {keys[i]: vec for i, vec in zip(missing, new)}
+            self.cache.put_many(fresh)
+            found.update(fresh)
+
+        return np.stack([found[k] for k in keys]).astype(np.float32, copy=False)
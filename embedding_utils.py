@@ -4,15 +4,25 @@ Embedding utilities for RAG applications.
 Provides easy integration with sentence-transformers and other embedding models.
 """
 
+import importlib.util
 import numpy as np
-from typing import List, Dict, Optional, Union
+from typing import List, Dict, Optional, Tuple, Union
 import json
+import mmap
+import os
+import threading
+import warnings
 
-try:
-    from sentence_transformers import SentenceTransformer
-    SENTENCE_TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    SENTENCE_TRANSFORMERS_AVAILABLE = False
+# sentence-transformers pulls in torch/transformers (seconds of import time),
+# so only check it is installed here and import it on first use
+SENTENCE_TRANSFORMERS_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+
+def __getattr__(name):
+    if name == "SentenceTransformer" and SENTENCE_TRANSFORMERS_AVAILABLE:
+        from sentence_transformers import SentenceTransformer
+        globals()["SentenceTransformer"] = SentenceTransformer
+        return SentenceTransformer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 try:
     import faiss
@@ -20,6 +30,55 @@ try:
 except ImportError:
     FAISS_AVAILABLE = False
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Placeholder for fields a chunk doesn't have in the columnar chunk store
+_MISSING = object()
+
+def _dumps_bytes(obj) -> bytes:
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+def _loads_bytes(data: bytes):
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Loaded models keyed by (model_name, device), kept for the lifetime of the
+# process so repeated EmbeddingGenerator construction doesn't reload weights
+_MODEL_CACHE: Dict[Tuple[str, Optional[str]], Tuple["SentenceTransformer", int]] = {}
+# Guards the two dicts only; each load holds its own key's lock, so loading one
+# model never blocks callers of another, already cached model
+_MODEL_CACHE_LOCK = threading.Lock()
+_MODEL_LOAD_LOCKS: Dict[Tuple[str, Optional[str]], threading.Lock] = {}
+
+def _load_model(model_name: str, device: str) -> Tuple["SentenceTransformer", int]:
+    """Return the cached (model, dimension) for ``(model_name, device)``, loading it once."""
+    key = (model_name, device)
+    with _MODEL_CACHE_LOCK:
+        cached = _MODEL_CACHE.get(key)
+        if cached is not None:
+            return cached
+        load_lock = _MODEL_LOAD_LOCKS.setdefault(key, threading.Lock())
+    
+    # Concurrent requests for the same model wait here for the first load
+    with load_lock:
+        cached = _MODEL_CACHE.get(key)
+        if cached is None:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(model_name, device=device)
+            if device.startswith("cuda"):
+                model = model.half()
+            cached = (model, model.get_sentence_embedding_dimension())
+            with _MODEL_CACHE_LOCK:
+                _MODEL_CACHE[key] = cached
+    return cached
+
 class EmbeddingGenerator:
     """Generate embeddings for text chunks using various models."""
     
@@ -27,34 +86,52 @@ class EmbeddingGenerator:
         """
         Initialize the embedding generator.
         
+        Models are cached per (model_name, device) for the lifetime of the
+        process; only the first generator for a given key loads weights.
+        
         Args:
             model_name: Name of the sentence-transformers model to use
-            device: Device to use ('cpu', 'cuda', etc.)
+            device: Device to use ('cpu', 'cuda', etc.); None or 'auto' picks
+                CUDA when available. On CUDA the model runs in FP16.
         """
         if not SENTENCE_TRANSFORMERS_AVAILABLE:
             raise ImportError(
                 "sentence-transformers is required. Install with: pip install sentence-transformers"
             )
         
+        if device in (None, "auto"):
+            import torch
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        
         self.model_name = model_name
-        self.model = SentenceTransformer(model_name, device=device)
-        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.device = device
+        self.model, self.dimension = _load_model(model_name, device)
     
-    def generate_embeddings(self, texts: List[str]) -> np.ndarray:
+    def generate_embeddings(self, texts: List[str], batch_size: int = 128,
+                            show_progress_bar: bool = False) -> np.ndarray:
         """
         Generate embeddings for a list of texts.
         
         Args:
             texts: List of text strings to embed
+            batch_size: Number of texts encoded per model forward pass
+            show_progress_bar: Show the sentence-transformers progress bar
             
         Returns:
-            numpy array of embeddings
+            numpy array of L2-normalized float32 embeddings
         """
         if not texts:
             return np.array([])
         
-        embeddings = self.model.encode(texts, convert_to_numpy=True)
-        return embeddings
+        embeddings = self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                                       normalize_embeddings=True,
+                                       show_progress_bar=show_progress_bar)
+        # FP16 models return float16; FAISS and the JSONL writers expect float32
+        if embeddings.dtype == np.float16:
+            # Half-precision normalization leaves norms visibly off 1; redo it in
+            # float32 as one batched pass over the whole matrix
+            return normalize_embeddings(embeddings.astype(np.float32))
+        return embeddings.astype(np.float32, copy=False)
     
     def generate_embedding(self, text: str) -> np.ndarray:
         """
@@ -68,42 +145,79 @@ class EmbeddingGenerator:
         """
         return self.generate_embeddings([text])[0]
     
-    def add_embeddings_to_chunks(self, chunks: List[Dict]) -> List[Dict]:
+    def add_embeddings_to_chunks(self, chunks: List[Dict],
+                                 vector_store: Optional["VectorStore"] = None) -> List[Dict]:
         """
         Add embeddings to a list of document chunks.
         
         Args:
             chunks: List of chunk dictionaries with 'text' field
+            vector_store: If given, embeddings go straight into this store
+                instead of being copied onto the chunks as Python lists
             
         Returns:
-            List of chunks with added 'embedding' field
+            List of chunks, with an added 'embedding' field unless a
+            vector_store was given
         """
         texts = [chunk['text'] for chunk in chunks]
         embeddings = self.generate_embeddings(texts)
         
+        if vector_store is not None:
+            vector_store.add_embeddings(embeddings, chunks)
+            return chunks
+        
         for chunk, embedding in zip(chunks, embeddings):
-            chunk['embedding'] = embedding.tolist()
+            chunk['embedding'] = embedding.astype(np.float32).tolist()
         
         return chunks
 
 class VectorStore:
     """Simple vector store using FAISS for similarity search."""
     
-    def __init__(self, dimension: int, index_type: str = "flat"):
+    def __init__(self, dimension: int, index_type: str = "flat", nlist: int = 1024):
         """
         Initialize vector store.
         
         Args:
             dimension: Dimension of embeddings
-            index_type: Type of FAISS index ('flat', 'ivf', etc.)
+            index_type: Type of FAISS index:
+                'flat'  - exact float32 inner-product search
+                'sq8'   - 8-bit scalar quantized vectors (~4x less memory)
+                'ivfpq' - inverted lists with product quantization, for large
+                          corpora; the first add needs at least ``nlist`` vectors
+            nlist: Number of inverted lists for 'ivfpq'
         """
         if not FAISS_AVAILABLE:
             raise ImportError("FAISS is required. Install with: pip install faiss-cpu")
         
         self.dimension = dimension
         self.index_type = index_type
-        self.index = faiss.IndexFlatIP(dimension)  # Inner product for cosine similarity
-        self.chunks = []
+        self.nlist = nlist
+        if index_type == "flat":
+            self.index = faiss.IndexFlatIP(dimension)  # Inner product for cosine similarity
+        elif index_type == "sq8":
+            self.index = faiss.IndexScalarQuantizer(
+                dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+            )
+        elif index_type == "ivfpq":
+            if dimension % 4:
+                raise ValueError(f"'ivfpq' needs a dimension divisible by 4, got {dimension}")
+            self._quantizer = faiss.IndexFlatIP(dimension)  # must outlive the IVF index
+            self.index = faiss.IndexIVFPQ(
+                self._quantizer, dimension, nlist, dimension // 4, 8, faiss.METRIC_INNER_PRODUCT
+            )
+        else:
+            raise ValueError(f"Unsupported index type: {index_type}")
+        
+        # Chunk fields are stored column-wise: one list per key, row i is chunk i
+        self.columns: Dict[str, List] = {}
+        self._num_rows = 0
+        
+        # After load(), chunks [0, _num_mapped) stay on disk in a memory-mapped
+        # JSONL file and are decoded on demand; self.columns holds the rest
+        self._mm = None
+        self._offsets = None
+        self._num_mapped = 0
     
     def add_chunks(self, chunks: List[Dict]):
         """
@@ -115,9 +229,65 @@ class VectorStore:
         if not chunks:
             return
         
-        embeddings = np.array([chunk['embedding'] for chunk in chunks])
+        # Fill one float32 buffer directly and hand it over; nobody else holds
+        # it, so it can be normalized in place without another copy
+        embeddings = np.empty((len(chunks), self.dimension), dtype=np.float32)
+        for i, chunk in enumerate(chunks):
+            embeddings[i] = chunk['embedding']
+        self._add_owned(embeddings, chunks)
+    
+    def add_embeddings(self, embeddings: np.ndarray, chunks: List[Dict]):
+        """
+        Add precomputed embeddings with their chunks to the vector store.
+        
+        The vectors live only in the FAISS index; any 'embedding' field on the
+        chunks is not kept.
+        
+        Args:
+            embeddings: Array of shape (len(chunks), dimension)
+            chunks: List of chunk dictionaries, row-aligned with embeddings
+        """
+        if not chunks:
+            return
+        
+        # Copy: normalization happens in place and must not touch the caller's array
+        self._add_owned(np.array(embeddings, dtype=np.float32).reshape(len(chunks), self.dimension),
+                        chunks)
+    
+    def _add_owned(self, embeddings: np.ndarray, chunks: List[Dict]):
+        """Add a C-contiguous float32 (len(chunks), dimension) array this store may modify."""
+        # L2-normalize so inner product on the index is cosine similarity
+        faiss.normalize_L2(embeddings)
+        
+        if not self.index.is_trained:
+            if self.index_type == "ivfpq" and len(embeddings) < self.nlist:
+                raise ValueError(
+                    f"'ivfpq' index needs at least {self.nlist} vectors to train, got {len(embeddings)}"
+                )
+            self.index.train(embeddings)
+        
         self.index.add(embeddings)
-        self.chunks.extend(chunks)
+        self._append_rows(chunks)
+    
+    @property
+    def chunks(self) -> List[Dict]:
+        """All stored chunks as a list of dicts (materialized on access)."""
+        return [self._get_chunk(i) for i in range(self._num_mapped + self._num_rows)]
+    
+    def _append_rows(self, chunks: List[Dict]):
+        """Append chunks to the column store, leaving out their embeddings."""
+        for chunk in chunks:
+            for key, value in chunk.items():
+                if key == 'embedding':
+                    continue
+                column = self.columns.get(key)
+                if column is None:
+                    column = self.columns[key] = [_MISSING] * self._num_rows
+                column.append(value)
+            self._num_rows += 1
+            for column in self.columns.values():
+                if len(column) < self._num_rows:
+                    column.append(_MISSING)
     
     def search(self, query_embedding: np.ndarray, k: int = 5) -> List[Dict]:
         """
@@ -133,35 +303,70 @@ class VectorStore:
         if self.index.ntotal == 0:
             return []
         
-        # Reshape for single query
-        query_embedding = query_embedding.reshape(1, -1)
+        # Copy to a contiguous float32 row and normalize like the stored vectors
+        query = np.array(query_embedding, dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(query)
         
         # Search
-        scores, indices = self.index.search(query_embedding, min(k, self.index.ntotal))
+        scores, indices = self.index.search(query, min(k, self.index.ntotal))
         
         results = []
         for score, idx in zip(scores[0], indices[0]):
-            if idx < len(self.chunks):
-                result = self.chunks[idx].copy()
+            if 0 <= idx < self._num_mapped + self._num_rows:
+                result = self._get_chunk(int(idx))
                 result['similarity_score'] = float(score)
                 results.append(result)
         
         return results
     
+    def _get_chunk(self, idx: int) -> Dict:
+        """Return a copy of chunk ``idx``, decoding it from the mapped store if needed."""
+        if idx < self._num_mapped:
+            start, end = self._offsets[idx], self._offsets[idx + 1]
+            return _loads_bytes(self._mm[start:end])
+        row = idx - self._num_mapped
+        return {k: v[row] for k, v in self.columns.items() if v[row] is not _MISSING}
+    
     def save(self, filepath: str):
-        """Save the vector store to disk."""
+        """
+        Save the vector store to disk.
+        
+        Writes ``.index`` (FAISS), ``.chunks.jsonl`` (one chunk per line) and
+        ``.offsets.npy`` (byte offset of every line) so load() can fetch
+        individual chunks without parsing the whole file.
+        """
         faiss.write_index(self.index, f"{filepath}.index")
         
-        # Save chunks separately
-        with open(f"{filepath}.chunks.json", 'w') as f:
-            json.dump(self.chunks, f, indent=2)
+        # Save chunk metadata separately; vectors are only in the index.
+        # Write to a temp file first since it may be the file we have mapped.
+        chunks_path = f"{filepath}.chunks.jsonl"
+        offsets = [0]
+        with open(f"{chunks_path}.tmp", 'wb') as f:
+            for i in range(self._num_mapped + self._num_rows):
+                line = _dumps_bytes(self._get_chunk(i)) + b"\n"
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+        os.replace(f"{chunks_path}.tmp", chunks_path)
+        np.save(f"{filepath}.offsets.npy", np.array(offsets, dtype=np.int64))
     
     def load(self, filepath: str):
-        """Load the vector store from disk."""
+        """Load the vector store from disk; chunks are read lazily on search."""
         self.index = faiss.read_index(f"{filepath}.index")
+        self.columns, self._num_rows = {}, 0
+        self._mm, self._offsets, self._num_mapped = None, None, 0
+        
+        chunks_path = f"{filepath}.chunks.jsonl"
+        if not os.path.exists(chunks_path):
+            # Stores saved before the JSONL layout
+            with open(f"{filepath}.chunks.json", 'r') as f:
+                self._append_rows(json.load(f))
+            return
         
-        with open(f"{filepath}.chunks.json", 'r') as f:
-            self.chunks = json.load(f)
+        self._offsets = np.load(f"{filepath}.offsets.npy")
+        self._num_mapped = len(self._offsets) - 1
+        if self._num_mapped:
+            with open(chunks_path, 'rb') as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
 def normalize_embeddings(embeddings: np.ndarray) -> np.ndarray:
     """
@@ -173,14 +378,54 @@ def normalize_embeddings(embeddings: np.ndarray) -> np.ndarray:
     Returns:
         Normalized embeddings
     """
-    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
-    norms = np.where(norms == 0, 1, norms)  # Avoid division by zero
-    return embeddings / norms
+    if not np.issubdtype(embeddings.dtype, np.floating):
+        # Integer input: the in-place sqrt below needs a float norms array
+        embeddings = embeddings.astype(np.float32)
+    # Row-wise squared norms without the temporary np.linalg.norm allocates
+    norms = np.einsum('ij,ij->i', embeddings, embeddings)
+    np.sqrt(norms, out=norms)
+    norms[norms == 0] = 1  # Avoid division by zero
+    return embeddings / norms[:, None]
+
+def quantize_embeddings_int8(embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Quantize embeddings to int8 with one symmetric scale per vector.
+    
+    Args:
+        embeddings: (N, D) float embeddings
+        
+    Returns:
+        Tuple of (int8 codes, float32 scales); row i is approximately
+        ``codes[i] * scales[i]``
+    """
+    scales = np.abs(embeddings).max(axis=1).astype(np.float32) / 127
+    scales[scales == 0] = 1  # All-zero vectors quantize to zeros
+    codes = np.rint(embeddings / scales[:, None]).astype(np.int8)
+    return codes, scales
+
+def cosine_similarity_batch(query: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """
+    Calculate cosine similarity between a query and every row of a matrix.
+    
+    Both inputs must already be L2-normalized (see normalize_embeddings), so
+    the scores reduce to a single matrix-vector product.
+    
+    Args:
+        query: Normalized query vector of shape (dim,)
+        matrix: Normalized embeddings of shape (n, dim)
+        
+    Returns:
+        Array of n similarity scores
+    """
+    return matrix @ query
 
 def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     """
     Calculate cosine similarity between two vectors.
     
+    Deprecated: normalize once with normalize_embeddings and use
+    cosine_similarity_batch, or float(a @ b) for a single pair.
+    
     Args:
         a: First vector
         b: Second vector
@@ -188,6 +433,11 @@ def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     Returns:
         Cosine similarity score
     """
+    warnings.warn(
+        "cosine_similarity is deprecated; use normalize_embeddings with cosine_similarity_batch",
+        DeprecationWarning,
+        stacklevel=2,
+    )
     a_norm = a / np.linalg.norm(a)
     b_norm = b / np.linalg.norm(b)
     return np.dot(a_norm, b_norm)
@@ -210,7 +460,7 @@ def batch_embed_with_progress(texts: List[str], model_name: str = "all-MiniLM-L6
     
     for i in range(0, len(texts), batch_size):
         batch = texts[i:i + batch_size]
-        batch_embeddings = generator.generate_embeddings(batch)
+        batch_embeddings = generator.generate_embeddings(batch, batch_size=batch_size)
         embeddings.append(batch_embeddings)
         
         # Progress update
@@ -255,7 +505,8 @@ if __name__ == "__main__":
         
         # Test similarity
         if len(embeddings) >= 2:
-            similarity = cosine_similarity(embeddings[0], embeddings[1])
+            normalized = normalize_embeddings(embeddings)
+            similarity = cosine_similarity_batch(normalized[0], normalized)[1]
             print(f"Similarity between first two texts: {similarity:.3f}")
     else:
         print("sentence-transformers not available. Install with: pip install sentence-transformers")
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+"""
+Numba compilation helpers for the chunking pipeline.
+Everything here is optional: check NUMBA_AVAILABLE before calling.
+"""
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+def compile_cached(func):
+    """
+    Compile a pure-Python function with numba in nopython mode. cache=True keeps
+    the compiled code on disk, so only the first run pays for JIT.
+    """
+    return njit(cache=True)(func)
@@ -1,45 +1,94 @@
 #!/usr/bin/env python3
 import re, os, json, argparse, sys
+import bisect
+import functools
+import itertools
+import multiprocessing
 from datetime import date
-from typing import List, Dict, Tuple
+from typing import List, Dict, Iterable, Iterator, Tuple, Optional
+
+# Our document readers (pypdf, python-docx, pandas, ...) and embedding stack are
+# imported on first use, so importing the chunker alone stays cheap
+@functools.lru_cache(maxsize=1)
+def _load_document_processor():
+    """Return the document_processor module, or None if it can't be imported."""
+    try:
+        import document_processor
+    except ImportError:
+        return None
+    return document_processor
+
+@functools.lru_cache(maxsize=1)
+def _load_embedding_utils():
+    """Return the embedding_utils module, or None if it can't be imported."""
+    try:
+        import embedding_utils
+    except ImportError:
+        return None
+    return embedding_utils
 
-# Import our new modules
 try:
-    from document_processor import DocumentProcessor, clean_text
-    DOCUMENT_PROCESSOR_AVAILABLE = True
+    import orjson
+    ORJSON_AVAILABLE = True
 except ImportError:
-    DOCUMENT_PROCESSOR_AVAILABLE = False
+    ORJSON_AVAILABLE = False
 
 try:
-    from embedding_utils import EmbeddingGenerator
-    EMBEDDING_AVAILABLE = True
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    PYARROW_AVAILABLE = True
 except ImportError:
-    EMBEDDING_AVAILABLE = False
+    PYARROW_AVAILABLE = False
+
+# Sentence boundary: punctuation followed by whitespace and a capital/number.
+# A bullet '•' reads as ". ", so it is a boundary before a capital/number even
+# without whitespace after it
+_RE_SENT_BOUNDARY = re.compile(r'[.!?]\s+(?=[A-Z0-9])|•\s*(?=[A-Z0-9])')
 
 # Token counting with fallback
+_ENC = None
+
+def _get_encoder():
+    """Return the shared cl100k_base encoder, or None if tiktoken is unavailable.
+
+    The encoder is built once per process; constructing it is far more
+    expensive than encoding a sentence.
+    """
+    global _ENC
+    if _ENC is None:
+        try:
+            import tiktoken
+            _ENC = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            # ImportError or a failed encoding download: remember the miss
+            _ENC = False
+    return _ENC or None
+
 def count_tokens(s: str) -> int:
     """Count tokens in text. Uses tiktoken if available, otherwise estimates with words."""
-    try:
-        import tiktoken
-        enc = tiktoken.get_encoding("cl100k_base")
-        return len(enc.encode(s))
-    except ImportError:
-        # Fallback: rough estimation using words
-        # 1 token ≈ 0.75 words on average
-        return int(len(s.split()) * 0.75)
-    except Exception:
-        # If tiktoken fails for any reason, fall back to word estimation
-        return int(len(s.split()) * 0.75)
+    enc = _get_encoder()
+    if enc is not None:
+        try:
+            return len(enc.encode(s))
+        except Exception:
+            pass
+    # Fallback: rough estimation using words
+    # 1 token ≈ 0.75 words on average
+    return int(len(s.split()) * 0.75)
+
+def count_tokens_batch(strs: List[str]) -> List[int]:
+    """Count tokens for many strings in one call, using tiktoken's batch encoder."""
+    enc = _get_encoder()
+    if enc is not None:
+        try:
+            return [len(t) for t in enc.encode_batch(strs, num_threads=os.cpu_count() or 1)]
+        except Exception:
+            pass
+    word_counts = [len(s.split()) for s in strs]
+    return [int(n * 0.75) for n in word_counts]
 
 def read_file(path: str) -> str:
-    """Read file content, supporting multiple formats."""
-    if DOCUMENT_PROCESSOR_AVAILABLE:
-        processor = DocumentProcessor()
-        if processor.can_process(path):
-            text, metadata = processor.extract_text(path)
-            return clean_text(text)
-    
-    # Fallback to original method for markdown/text files
+    """Read raw file content (plain text/markdown fallback)."""
     with open(path, "r", encoding="utf-8") as f:
         return f.read()
 
@@ -58,69 +107,173 @@ def parse_front_matter(md: str) -> Tuple[Dict, str]:
             return meta, body
     return {}, md
 
+def iter_sentences(blocks: Iterable[str]) -> Iterator[str]:
+    """
+    Yield sentences from text arriving in consecutive blocks, e.g. a file read
+    piecewise. The text after the last boundary in a block is carried into the
+    next one, so results match splitting the concatenated text.
+    """
+    carry = ""
+    for block in blocks:
+        text = carry + block
+        start = 0
+        for m in _RE_SENT_BOUNDARY.finditer(text):
+            # Keep the punctuation (or bullet) that ends the sentence
+            sent = _clean_sentence(text[start:m.start() + 1])
+            if sent:
+                yield sent
+            start = m.end()
+        carry = text[start:]
+    sent = _clean_sentence(carry)
+    if sent:
+        yield sent
+
+def _clean_sentence(raw: str) -> str:
+    # Collapse whitespace first, then expand bullets to period + space, so a
+    # bullet followed by whitespace keeps the double space it always had
+    return " ".join(raw.split()).replace("•", ". ").strip()
+
 def split_sentences(text: str) -> List[str]:
     # simple sentence/list splitter that also handles bullets; keeps newlines as spaces
-    text = re.sub(r'\s+', ' ', text.strip())
-    # treat bullet '•' as boundary; replace with period + space
-    text = text.replace("•", ". ")
-    # split by punctuation followed by space-capital/number or end
-    parts = re.split(r'(?<=[.!?])\s+(?=[A-Z0-9])', text)
-    return [p.strip() for p in parts if p.strip()]
-
-def make_chunks(text: str, target_tokens=280, overlap_tokens=40) -> List[str]:
-    sents = split_sentences(text)
-    chunks, cur, cur_toks = [], [], 0
+    # single scan over the raw text for boundaries; whitespace is normalized
+    # per sentence rather than by copying the whole document first
+    return list(iter_sentences((text,)))
+
+def _chunk_indices_py(tok_counts, target_tokens, overlap_tokens):
+    """
+    Decide chunk boundaries from per-sentence token counts.
+    Returns (starts, ends) so chunk k is sentences[starts[k]:ends[k]].
+    """
+    starts, ends = [], []
+    n = len(tok_counts)
+    start, cur_toks = 0, 0
     
-    for s in sents:
-        st = count_tokens(s)
+    for i in range(n):
+        st = tok_counts[i]
         
-        # If adding this sentence would exceed target, create a chunk
-        if cur and cur_toks + st > target_tokens:
-            chunk_text = " ".join(cur).strip()
-            chunks.append(chunk_text)
+        # If adding this sentence would exceed target, close the chunk
+        if i > start and cur_toks + st > target_tokens:
+            starts.append(start)
+            ends.append(i)
             
-            # Handle overlap: keep some sentences from the end
             if overlap_tokens > 0:
-                # Calculate how many tokens to keep for overlap
+                # Walk backwards keeping whole sentences that fit the overlap
                 overlap_remaining = overlap_tokens
-                overlap_sents = []
-                
-                # Start from the end and work backwards
-                for sent in reversed(cur):
-                    sent_tokens = count_tokens(sent)
-                    if overlap_remaining >= sent_tokens:
-                        overlap_sents.insert(0, sent)
-                        overlap_remaining -= sent_tokens
-                    else:
-                        # If we can't fit the whole sentence, break
-                        break
-                
-                # Start the next chunk with the overlap sentences
-                cur = overlap_sents
-                cur_toks = sum(count_tokens(s) for s in cur)
+                j = i
+                while j > start and overlap_remaining >= tok_counts[j - 1]:
+                    overlap_remaining -= tok_counts[j - 1]
+                    j -= 1
+                start = j
+                cur_toks = overlap_tokens - overlap_remaining
             else:
-                cur, cur_toks = [], 0
+                start, cur_toks = i, 0
         
-        # Add current sentence to the chunk
-        cur.append(s)
         cur_toks += st
     
     # Add the final chunk if there's content
-    if cur:
-        chunks.append(" ".join(cur).strip())
+    if n > start:
+        starts.append(start)
+        ends.append(n)
     
-    return chunks
+    return starts, ends
 
-def build_items(body: str, base_meta: Dict, section: str, target_tokens=280, overlap_tokens=40, 
-                generate_embeddings=False, embedding_model="all-MiniLM-L6-v2") -> List[Dict]:
-    chunks = make_chunks(body, target_tokens, overlap_tokens)
-    out = []
+@functools.lru_cache(maxsize=1)
+def _compiled_chunk_indices():
+    """Return (numpy, numba-compiled ``_chunk_indices_py``) on first use, or None without numba."""
+    try:
+        import numpy as np
+        import numba_utils
+    except ImportError:
+        return None
+    if not numba_utils.NUMBA_AVAILABLE:
+        return None
+    return np, numba_utils.compile_cached(_chunk_indices_py)
+
+def _chunk_indices(tok_counts, target_tokens, overlap_tokens):
+    """``_chunk_indices_py``, numba-compiled when numba is installed."""
+    loaded = _compiled_chunk_indices()
+    if loaded is None or not tok_counts:
+        return _chunk_indices_py(tok_counts, target_tokens, overlap_tokens)
+    np, compiled = loaded
+    return compiled(np.asarray(tok_counts, dtype=np.int64), int(target_tokens), int(overlap_tokens))
+
+def _chunk_indices_bisect(tok_counts, target_tokens, overlap_tokens):
+    """
+    Same boundaries as ``_chunk_indices_py``, found by binary search over the
+    token-count prefix sums: O(log n) per chunk instead of a step per sentence.
+    """
+    n = len(tok_counts)
+    prefix = [0, *itertools.accumulate(tok_counts)]
+    starts, ends = [], []
+    start, last_end = 0, 0
+    
+    while True:
+        # First sentence index i > start (and past the previous close) whose
+        # addition takes the chunk over target
+        k = bisect.bisect_right(prefix, prefix[start] + target_tokens, last_end + 2)
+        if k > n:
+            break
+        i = k - 1
+        starts.append(start)
+        ends.append(i)
+        last_end = i
+        # Keep the longest run of whole sentences before i that fits the overlap
+        start = bisect.bisect_left(prefix, prefix[i] - overlap_tokens, start, i) if overlap_tokens > 0 else i
+    
+    if n > start:
+        starts.append(start)
+        ends.append(n)
+    
+    return starts, ends
+
+_CHUNK_STRATEGIES = {"linear": _chunk_indices, "binary": _chunk_indices_bisect}
+
+def make_chunks(text: str, target_tokens=280, overlap_tokens=40, search_strategy="linear") -> List[str]:
+    sents = split_sentences(text)
+    if not sents:
+        return []
+    
+    # Every token covers at least one UTF-8 byte, so a text whose byte length
+    # fits the target is a single chunk; skip the tokenizer entirely. The
+    # character count never exceeds the byte count, so test it first and only
+    # encode texts that are already short
+    if len(text) <= target_tokens and len(text.encode("utf-8")) <= target_tokens:
+        return [" ".join(sents).strip()]
+    
+    return make_chunks_from_sentences(sents, target_tokens, overlap_tokens, search_strategy)
+
+def make_chunks_from_sentences(sents: Iterable[str], target_tokens=280, overlap_tokens=40,
+                               search_strategy="linear") -> List[str]:
+    """
+    Group already-split sentences (e.g. from ``iter_sentences``) into chunks.
+    ``search_strategy`` picks how boundaries are found: "linear" walks the
+    sentences (JIT-compiled when numba is installed), "binary" bisects prefix
+    sums; both give the same chunks.
+    """
+    sents = list(sents)
+    if not sents:
+        return []
+    tok_counts = count_tokens_batch(sents)
+    starts, ends = _CHUNK_STRATEGIES[search_strategy](tok_counts, target_tokens, overlap_tokens)
+    return [" ".join(sents[s:e]).strip() for s, e in zip(starts, ends)]
+
+def build_items_iter(body: str, base_meta: Dict, section: str, target_tokens=280, overlap_tokens=40, 
+                     generate_embeddings=False, embedding_model="all-MiniLM-L6-v2",
+                     chunks: Optional[List[str]] = None, embeddings=None,
+                     search_strategy="linear") -> Iterator[Dict]:
+    """
+    Chunk ``body`` and yield each chunk wrapped with metadata.
+    Pass ``chunks``/``embeddings`` when they were already computed by the caller
+    (e.g. one embedding pass across many files); they are then used as-is.
+    """
+    if chunks is None:
+        chunks = make_chunks(body, target_tokens, overlap_tokens, search_strategy)
     
     # Generate embeddings if requested
-    embeddings = None
-    if generate_embeddings and EMBEDDING_AVAILABLE:
+    embedding_utils = _load_embedding_utils() if embeddings is None and generate_embeddings else None
+    if embedding_utils is not None:
         try:
-            generator = EmbeddingGenerator(embedding_model)
+            generator = embedding_utils.EmbeddingGenerator(embedding_model)
             embeddings = generator.generate_embeddings(chunks)
         except Exception as e:
             print(f"Warning: Could not generate embeddings: {e}")
@@ -139,60 +292,104 @@ def build_items(body: str, base_meta: Dict, section: str, target_tokens=280, ove
         
         # Add embedding if available
         if embeddings is not None and i <= len(embeddings):
-            item["embedding"] = embeddings[i-1].tolist()
+            item["embedding"] = embeddings[i-1]
         
-        out.append(item)
-    return out
+        yield item
+
+def build_items(body: str, base_meta: Dict, section: str, target_tokens=280, overlap_tokens=40, 
+                generate_embeddings=False, embedding_model="all-MiniLM-L6-v2",
+                chunks: Optional[List[str]] = None, embeddings=None,
+                search_strategy="linear") -> List[Dict]:
+    """List version of ``build_items_iter``."""
+    return list(build_items_iter(body, base_meta, section, target_tokens, overlap_tokens,
+                                 generate_embeddings, embedding_model, chunks, embeddings,
+                                 search_strategy))
+
+def json_default(obj):
+    """``json.dumps`` fallback for numpy values such as embedding arrays."""
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+# One encoder for every stdlib fallback call instead of a fresh one per json.dumps;
+# items are plain dicts, so the circular-reference check is skipped
+_ENCODE = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), check_circular=False,
+                           default=json_default).encode
 
-def save_jsonl(items: List[Dict], out_path: str):
+def _dumps_jsonl(item: Dict) -> bytes:
+    """Serialize one item to UTF-8 JSON bytes (no trailing newline)."""
+    if ORJSON_AVAILABLE:
+        # orjson serializes numpy embeddings natively
+        return orjson.dumps(item, option=orjson.OPT_SERIALIZE_NUMPY)
+    # Compact separators match orjson's output and trim every line
+    return _ENCODE(item).encode("utf-8")
+
+def save_jsonl(items: List[Dict], out_path: str, flush_every: int = 1000):
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    with open(out_path, "w", encoding="utf-8") as f:
-        for it in items:
-            f.write(json.dumps(it, ensure_ascii=False) + "\n")
+    # Accumulate encoded lines and hand them to a large buffered writer in
+    # blocks, so big outputs cost a handful of write() calls
+    buf = bytearray()
+    with open(out_path, "wb", buffering=1 << 20) as f:
+        for n, it in enumerate(items, 1):
+            buf += _dumps_jsonl(it)
+            buf += b"\n"
+            if n % flush_every == 0:
+                f.write(buf)
+                buf.clear()
+        f.write(buf)
     print(f"Wrote {len(items)} chunks → {out_path}")
 
 def save_csv(items: List[Dict], out_path: str):
     """Save chunks as CSV for easy viewing."""
-    import pandas as pd
-    
-    # Flatten metadata for CSV
-    csv_data = []
-    for item in items:
-        row = {
-            'id': item['id'],
-            'text': item['text'],
-            **item['metadata']
-        }
-        csv_data.append(row)
+    # Flatten metadata for CSV, building one column per field directly
+    meta_keys = dict.fromkeys(k for item in items for k in item['metadata'])
+    meta_keys.pop('id', None)
+    meta_keys.pop('text', None)
+    columns = {
+        'id': [item['id'] for item in items],
+        'text': [item['text'] for item in items],
+    }
+    for k in meta_keys:
+        columns[k] = [item['metadata'].get(k) for item in items]
     
-    df = pd.DataFrame(csv_data)
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    df.to_csv(out_path, index=False)
+    if PYARROW_AVAILABLE:
+        # Let Arrow write string columns in one pass; lists/dates are written
+        # as their str() form, as pandas did
+        pa_csv.write_csv(pa.table({
+            k: ["" if v is None else str(v) for v in col] for k, col in columns.items()
+        }), out_path)
+    else:
+        import pandas as pd
+        pd.DataFrame(columns).to_csv(out_path, index=False)
     print(f"Wrote {len(items)} chunks → {out_path}")
 
-def cmd_chunk(args):
+def chunk_file(input_path: str, out_path: str, section: Optional[str] = None,
+               slug: Optional[str] = None, chunk_size: int = 280, overlap: int = 40,
+               embeddings: bool = False, embedding_model: str = "all-MiniLM-L6-v2") -> List[Dict]:
+    """Chunk a single file and save it to ``out_path`` (.jsonl or .csv); returns the items."""
     # Extract text from file
-    if DOCUMENT_PROCESSOR_AVAILABLE:
-        processor = DocumentProcessor()
-        if processor.can_process(args.input):
-            text, file_metadata = processor.extract_text(args.input)
-            text = clean_text(text)
+    document_processor = _load_document_processor()
+    if document_processor is not None:
+        processor = document_processor.DocumentProcessor()
+        if processor.can_process(input_path):
+            text, file_metadata = document_processor.extract_and_clean(input_path, processor)
         else:
-            text = read_file(args.input)
+            text = read_file(input_path)
             file_metadata = {}
     else:
-        text = read_file(args.input)
+        text = read_file(input_path)
         file_metadata = {}
     
     # Parse front matter if it's a markdown file
-    if args.input.lower().endswith('.md'):
+    if input_path.lower().endswith('.md'):
         fm, body = parse_front_matter(text)
     else:
         fm, body = {}, text
     
     base_meta = {
-        "title": fm.get("title", file_metadata.get("title", os.path.basename(args.input))),
-        "slug": fm.get("slug", args.slug or os.path.splitext(os.path.basename(args.input))[0]),
+        "title": fm.get("title", file_metadata.get("title", os.path.basename(input_path))),
+        "slug": fm.get("slug", slug or os.path.splitext(os.path.basename(input_path))[0]),
         "jurisdiction": fm.get("jurisdiction","GB"),
         "doc_type": fm.get("doc_type","guidance"),
         "version": fm.get("version","1.0"),
@@ -204,53 +401,103 @@ def cmd_chunk(args):
         "source_format": file_metadata.get("format", "unknown"),
     }
     
-    section = args.section or fm.get("section","Main")
-    items = build_items(body, base_meta, section, args.chunk_size, args.overlap, 
-                       args.embeddings, args.embedding_model)
+    section = section or fm.get("section","Main")
+    items = build_items(body, base_meta, section, chunk_size, overlap, 
+                       embeddings, embedding_model)
     
     # Save in requested format
-    if args.out.endswith('.csv'):
-        save_csv(items, args.out)
+    if out_path.endswith('.csv'):
+        save_csv(items, out_path)
+    else:
+        save_jsonl(items, out_path)
+    return items
+
+def batch_chunk_file(input_path: str, out_path: str) -> int:
+    """
+    Process-pool entry point for the web UI's batch tab: chunk one file with
+    default settings into ``out_path`` and return only the chunk count, so the
+    items never cross back to the parent process.
+    """
+    return len(chunk_file(input_path, out_path))
+
+def cmd_chunk(args):
+    chunk_file(args.input, args.out, args.section, args.slug, args.chunk_size, args.overlap,
+               args.embeddings, args.embedding_model)
+
+def process_one(file_path: str, args) -> List[Dict]:
+    """
+    Read, clean and chunk one file for cmd_batch; returns items without embeddings.
+    Runs in a worker process, so failures are reported and yield no items.
+    """
+    try:
+        document_processor = _load_document_processor()
+        if document_processor is not None:
+            text, file_metadata = document_processor.extract_and_clean(file_path)
+        else:
+            text, file_metadata = read_file(file_path), {}
+    except Exception as e:
+        print(f"Warning: Could not process {file_path}: {e}")
+        return []
+    
+    # Parse front matter if it's a markdown file
+    if file_path.lower().endswith('.md'):
+        fm, body = parse_front_matter(text)
     else:
-        save_jsonl(items, args.out)
+        fm, body = {}, text
+    
+    base_meta = {
+        "title": fm.get("title", file_metadata.get("title", os.path.basename(file_path))),
+        "slug": fm.get("slug", (args.slug_prefix + "-" if args.slug_prefix else "") + 
+                      os.path.splitext(os.path.basename(file_path))[0]),
+        "jurisdiction": fm.get("jurisdiction","GB"),
+        "doc_type": fm.get("doc_type","guidance"),
+        "version": fm.get("version","1.0"),
+        "effective_date": fm.get("effective_date",""),
+        "review_date": fm.get("review_date",""),
+        "owner": fm.get("owner","HSE-App"),
+        "source_url": fm.get("source_url",""),
+        "tags": fm.get("tags", []),
+        "source_format": file_metadata.get("format", "unknown"),
+    }
+    
+    section = fm.get("section", os.path.splitext(os.path.basename(file_path))[0])
+    return build_items(body, base_meta, section, args.chunk_size, args.overlap)
+
+def _init_worker():
+    # Build the tokenizer once per worker rather than on its first file
+    _get_encoder()
 
 def cmd_batch(args):
-    if DOCUMENT_PROCESSOR_AVAILABLE:
-        processor = DocumentProcessor()
-        files_data = processor.batch_process(args.folder)
+    document_processor = _load_document_processor()
+    if document_processor is not None:
+        files = document_processor.DocumentProcessor().list_files(args.folder)
     else:
         # Fallback to original method
-        files = [os.path.join(args.folder, f) for f in os.listdir(args.folder) 
-                if f.lower().endswith((".md",".txt"))]
-        files_data = [(f, read_file(f), {}) for f in sorted(files)]
+        files = sorted(os.path.join(args.folder, f) for f in os.listdir(args.folder) 
+                       if f.lower().endswith((".md",".txt")))
     
-    all_items = []
-    for file_path, text, file_metadata in files_data:
-        # Parse front matter if it's a markdown file
-        if file_path.lower().endswith('.md'):
-            fm, body = parse_front_matter(text)
-        else:
-            fm, body = {}, text
-        
-        base_meta = {
-            "title": fm.get("title", file_metadata.get("title", os.path.basename(file_path))),
-            "slug": fm.get("slug", (args.slug_prefix + "-" if args.slug_prefix else "") + 
-                          os.path.splitext(os.path.basename(file_path))[0]),
-            "jurisdiction": fm.get("jurisdiction","GB"),
-            "doc_type": fm.get("doc_type","guidance"),
-            "version": fm.get("version","1.0"),
-            "effective_date": fm.get("effective_date",""),
-            "review_date": fm.get("review_date",""),
-            "owner": fm.get("owner","HSE-App"),
-            "source_url": fm.get("source_url",""),
-            "tags": fm.get("tags", []),
-            "source_format": file_metadata.get("format", "unknown"),
-        }
-        
-        section = fm.get("section", os.path.splitext(os.path.basename(file_path))[0])
-        items = build_items(body, base_meta, section, args.chunk_size, args.overlap,
-                           args.embeddings, args.embedding_model)
-        all_items.extend(items)
+    # First pass: read and chunk files in parallel; the work is CPU-bound
+    # (regex, tokenizer) and independent per file
+    jobs = [(f, args) for f in files]
+    if len(files) > 1:
+        with multiprocessing.Pool(min(os.cpu_count() or 1, len(files)),
+                                  initializer=_init_worker) as pool:
+            results = pool.starmap(process_one, jobs)
+    else:
+        results = list(itertools.starmap(process_one, jobs))
+    all_items = list(itertools.chain.from_iterable(results))
+    
+    # Second pass: embed all chunks of all files in one model call
+    embedding_utils = _load_embedding_utils()
+    if args.embeddings and embedding_utils is not None and all_items:
+        try:
+            generator = embedding_utils.EmbeddingGenerator(args.embedding_model)
+            embeddings = generator.generate_embeddings([it["text"] for it in all_items],
+                                                       batch_size=64, show_progress_bar=True)
+            for item, embedding in zip(all_items, embeddings):
+                item["embedding"] = embedding
+        except Exception as e:
+            print(f"Warning: Could not generate embeddings: {e}")
     
     # Save in requested format
     if args.out.endswith('.csv'):
@@ -3,24 +3,30 @@
 Setup script for RAG Document Processor
 """
 
+import argparse
+import hashlib
+import importlib.util
 import subprocess
 import sys
 import os
+import venv
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
-def run_command(command, description, capture_output=True):
-    """Run a command and handle errors."""
+def run_command(argv, description, capture_output=True):
+    """Run a command (given as an argv list, no shell) and handle errors."""
     print(f"🔄 {description}...")
     try:
+        # List argv without a shell lets subprocess use its posix_spawn/vfork path
         if capture_output:
-            result = subprocess.run(command, shell=True, check=True, capture_output=True, text=True)
+            result = subprocess.run(argv, check=True, close_fds=True, capture_output=True, text=True)
         else:
-            result = subprocess.run(command, shell=True, check=True)
+            result = subprocess.run(argv, check=True, close_fds=True)
         print(f"✅ {description} completed successfully")
         return True
-    except subprocess.CalledProcessError as e:
+    except (subprocess.CalledProcessError, OSError) as e:
         print(f"❌ {description} failed: {e}")
-        if capture_output and e.stderr:
+        if capture_output and getattr(e, "stderr", None):
             print(f"Error output: {e.stderr}")
         return False
 
@@ -39,9 +45,73 @@ def create_virtual_environment():
         print("✅ Virtual environment already exists")
         return True
     
-    return run_command("python -m venv .venv", "Creating virtual environment")
+    # Build the venv in this interpreter rather than starting another one
+    print("🔄 Creating virtual environment...")
+    try:
+        venv.EnvBuilder(with_pip=True, symlinks=(os.name != 'nt')).create(".venv")
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"❌ Creating virtual environment failed: {e}")
+        return False
+    print("✅ Creating virtual environment completed successfully")
+    return True
+
+def read_requirement_groups(path):
+    """
+    Read a requirements file as groups of independent requirements.
+    Each comment-headed block is one group; blank lines are ignored.
+    """
+    groups = [[]]
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("#"):
+                if groups[-1]:
+                    groups.append([])
+            elif line:
+                groups[-1].append(line)
+    return [g for g in groups if g]
+
+def download_requirements(pip_cmd, groups, wheel_dir, max_workers=4):
+    """Download requirement groups concurrently into a local wheel directory."""
+    commands = [
+        ([pip_cmd, "download", "-d", wheel_dir, *group],
+         f"Downloading {', '.join(group)}")
+        for group in groups
+    ]
+    
+    # Downloads are network-bound and touch nothing but wheel_dir, so they can
+    # overlap; installs into the venv still run one at a time afterwards
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        futures = [ex.submit(run_command, cmd, desc) for cmd, desc in commands]
+        for future in as_completed(futures):
+            results.append(future.result())
+    return all(results)
+
+def requirements_hash(path):
+    """Return the sha256 hex digest of a requirements file."""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _hash_stamp_path(path):
+    """Where the hash of the last successful install of ``path`` is recorded."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(".venv", f".{name}.sha256")
 
-def install_dependencies():
+def requirements_up_to_date(path):
+    """True if ``path`` is unchanged since it was last installed successfully."""
+    try:
+        with open(_hash_stamp_path(path), encoding="utf-8") as f:
+            return f.read().strip() == requirements_hash(path)
+    except OSError:
+        return False
+
+def mark_requirements_installed(path):
+    """Record the hash of ``path`` after a successful install."""
+    with open(_hash_stamp_path(path), "w", encoding="utf-8") as f:
+        f.write(requirements_hash(path) + "\n")
+
+def install_dependencies(parallel_downloads=4, with_optional=False):
     """Install project dependencies."""
     # Determine the correct pip command
     if os.name == 'nt':  # Windows
@@ -51,17 +121,63 @@ def install_dependencies():
         pip_cmd = ".venv/bin/pip"
         activate_cmd = "source .venv/bin/activate"
     
+    # Skip pip entirely for requirement files unchanged since the last install
+    install_core = not requirements_up_to_date("requirements.txt")
+    install_optional = with_optional and not requirements_up_to_date("requirements-optional.txt")
+    if not install_core and not install_optional:
+        print("✅ Dependencies up to date")
+        return True
+    
+    # Keep pip's wheel cache in the project so rebuilt venvs reuse built sdists;
+    # an explicitly configured PIP_CACHE_DIR still wins
+    os.environ.setdefault("PIP_CACHE_DIR", os.path.abspath(".pip-cache"))
+    
     # First, try to upgrade pip
     print("🔄 Upgrading pip...")
-    run_command(f"{pip_cmd} install --upgrade pip", "Upgrading pip", capture_output=False)
+    run_command([pip_cmd, "install", "--upgrade", "pip"], "Upgrading pip", capture_output=False)
+    
+    # wheel lets pip build sdists into cacheable wheels instead of legacy installs
+    run_command([pip_cmd, "install", "wheel"], "Installing wheel")
+    
+    # Fetch every requirement group in parallel; a failed download just means
+    # the install below fetches that package itself
+    requirement_files = []
+    if install_core:
+        requirement_files.append("requirements.txt")
+    if install_optional:
+        requirement_files.append("requirements-optional.txt")
+    groups = [g for path in requirement_files for g in read_requirement_groups(path)]
+    wheel_dir = os.path.join(".venv", "wheels")
+    if not download_requirements(pip_cmd, groups, wheel_dir, parallel_downloads):
+        print("⚠️  Some downloads failed; pip will retry them during install")
+    
+    find_links = ["--find-links", wheel_dir]
     
     # Install core dependencies
-    success = run_command(f"{pip_cmd} install -r requirements.txt", "Installing core dependencies")
+    if install_core:
+        success = run_command([pip_cmd, "install", *find_links, "-r", "requirements.txt"],
+                              "Installing core dependencies")
+        if success:
+            mark_requirements_installed("requirements.txt")
+            print("✅ Core dependencies installed successfully")
+    else:
+        print("✅ Core dependencies up to date")
+        success = True
     
     if success:
-        print("✅ Core dependencies installed successfully")
-        print("💡 To install optional dependencies (PDF, DOCX, embeddings support), run:")
-        print(f"   {pip_cmd} install -r requirements-optional.txt")
+        if install_optional:
+            if run_command([pip_cmd, "install", *find_links, "-r", "requirements-optional.txt"],
+                           "Installing optional dependencies"):
+                mark_requirements_installed("requirements-optional.txt")
+                print("✅ Optional dependencies installed successfully")
+            else:
+                print("⚠️  Some optional dependencies failed to install. Core features still work.")
+        elif with_optional:
+            print("✅ Optional dependencies up to date")
+        else:
+            print("💡 To install optional dependencies (PDF, DOCX, embeddings support), run:")
+            print(f"   {pip_cmd} install -r requirements-optional.txt")
+            print("   or re-run: python setup.py --with-optional")
     else:
         print("⚠️  Some dependencies failed to install. You can still use basic features.")
         print("💡 Try installing manually:")
@@ -83,29 +199,13 @@ def test_installation():
     """Test if the installation works."""
     print("🧪 Testing installation...")
     
-    # Test imports
-    try:
-        import gradio
-        print("✅ Gradio imported successfully")
-    except ImportError:
-        print("❌ Gradio import failed")
-        return False
-    
-    try:
-        import tiktoken
-        print("✅ Tiktoken imported successfully")
-    except ImportError:
-        print("❌ Tiktoken import failed")
-        return False
+    # Test imports; find_spec only locates the modules without loading them
+    for module, label in (("gradio", "Gradio"), ("tiktoken", "Tiktoken"), ("yaml", "PyYAML")):
+        if importlib.util.find_spec(module) is None:
+            print(f"❌ {label} import failed: module not found")
+            return False
+        print(f"✅ {label} found")
     
-    try:
-        import yaml
-        print("✅ PyYAML imported successfully")
-    except ImportError:
-        print("❌ PyYAML import failed")
-        return False
-    
-    # Test document processor (optional)
     try:
         from document_processor import DocumentProcessor
         processor = DocumentProcessor()
@@ -124,6 +224,13 @@ def test_installation():
 
 def main():
     """Main setup function."""
+    parser = argparse.ArgumentParser(description="Set up the RAG Document Processor environment.")
+    parser.add_argument("--parallel-downloads", type=int, default=4, metavar="N",
+                        help="Number of requirement groups to download concurrently (default: 4)")
+    parser.add_argument("--with-optional", action="store_true",
+                        help="Also install requirements-optional.txt")
+    args = parser.parse_args()
+    
     print("🚀 Setting up RAG Document Processor...")
     print("=" * 50)
     
@@ -138,7 +245,7 @@ def main():
         sys.exit(1)
     
     # Install dependencies
-    install_dependencies()
+    install_dependencies(max(1, args.parallel_downloads), args.with_optional)
     
     # Create output directory
     if not create_output_directory():
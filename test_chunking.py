@@ -3,8 +3,13 @@
 Test script to verify chunking logic
 """
 
+import functools
+
 from rag_builder import make_chunks, count_tokens, split_sentences
 
+# The sweeps below re-count the same sentences and chunks; memoize for this run only
+count_tokens = functools.lru_cache(maxsize=None)(count_tokens)
+
 def test_chunking():
     """Test the chunking logic with sample text."""
     
@@ -52,6 +57,10 @@ def test_chunking():
         
         chunks = make_chunks(sample_text, target_tokens, overlap_tokens)
         
+        # The binary-search boundary finder must agree with the linear one
+        binary_chunks = make_chunks(sample_text, target_tokens, overlap_tokens, search_strategy="binary")
+        assert binary_chunks == chunks, "binary search strategy produced different chunks"
+        
         print(f"  Generated {len(chunks)} chunks:")
         for i, chunk in enumerate(chunks, 1):
             chunk_tokens = count_tokens(chunk)
@@ -64,12 +73,22 @@ def test_chunking():
         
         # Check for overlap between consecutive chunks
         if len(chunks) > 1:
+            # Build each chunk's word set once; consecutive pairs share them
+            word_sets = [set(c.split()) for c in chunks]
             for i in range(len(chunks) - 1):
-                chunk1_words = set(chunks[i].split())
-                chunk2_words = set(chunks[i + 1].split())
+                chunk1_words = word_sets[i]
+                chunk2_words = word_sets[i + 1]
                 overlap_words = chunk1_words.intersection(chunk2_words)
                 overlap_ratio = len(overlap_words) / len(chunk1_words) if chunk1_words else 0
                 print(f"    Overlap between chunks {i+1} and {i+2}: {len(overlap_words)} words ({overlap_ratio:.1%})")
 
+def test_bullet_sentences():
+    """Bullets split like '. ' and keep the spacing the chunker has always produced."""
+    text = "Checks:\n• Wear gloves • check the guard\n•Report faults."
+    expected = ["Checks: .", "Wear gloves .  check the guard .", "Report faults."]
+    assert split_sentences(text) == expected, split_sentences(text)
+    print("✅ Bullet list sentences split as expected")
+
 if __name__ == "__main__":
     test_chunking()
+    test_bullet_sentences()
@@ -3,288 +3,711 @@
 Gradio UI for RAG Document Processor
 """
 
-import gradio as gr
+import atexit
+import functools
+import hashlib
+import importlib.util
 import tempfile
 import os
 import json
+import multiprocessing
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from datetime import datetime
+from datetime import date, datetime
+from types import MappingProxyType
 
 # Import our modules with fallbacks
 try:
-    from document_processor import DocumentProcessor, clean_text
-    DOCUMENT_PROCESSOR_AVAILABLE = True
-except ImportError:
-    DOCUMENT_PROCESSOR_AVAILABLE = False
-    print("⚠️  Document processor not available - limited file support")
-
-try:
-    from rag_builder import parse_front_matter, build_items
+    from rag_builder import (parse_front_matter, build_items_iter, make_chunks,
+                             make_chunks_from_sentences, iter_sentences, json_default,
+                             batch_chunk_file)
     RAG_BUILDER_AVAILABLE = True
 except ImportError:
     RAG_BUILDER_AVAILABLE = False
+    # Keeps the module-level encoder below importable; JSONEncoder's own default applies
+    json_default = None
     print("⚠️  RAG builder not available")
 
+# The MODEL_CONFIGS keys of embedding_utils, listed here so building the UI
+# doesn't import the embedding stack
+_EMBED_MODELS = ("fast", "balanced", "high_quality")
+
+# The document readers (pypdf, python-docx, pandas, ...) and the embedding stack
+# (numpy, sentence-transformers) are imported on first use, not at UI import
+@functools.lru_cache(maxsize=1)
+def _load_document_processor():
+    """Return a shared (DocumentProcessor, extract_and_clean), or (None, None)."""
+    try:
+        from document_processor import DocumentProcessor, extract_and_clean
+    except ImportError:
+        print("⚠️  Document processor not available - limited file support")
+        return None, None
+    # Shared across handlers; DocumentProcessor holds no per-file state
+    return DocumentProcessor(), extract_and_clean
+
+@functools.lru_cache(maxsize=1)
+def _load_embedding_utils():
+    """Return the (embedding_utils, embedding_cache) modules, or None."""
+    try:
+        import embedding_utils
+        import embedding_cache
+    except ImportError:
+        print("⚠️  Embedding utilities not available")
+        return None
+    return embedding_utils, embedding_cache
+
 try:
-    from embedding_utils import EmbeddingGenerator, MODEL_CONFIGS
-    EMBEDDING_AVAILABLE = True
+    import orjson
+    ORJSON_AVAILABLE = True
 except ImportError:
-    EMBEDDING_AVAILABLE = False
-    print("⚠️  Embedding utilities not available")
+    ORJSON_AVAILABLE = False
 
-def save_as_jsonl(jsonl_output, filename=None):
-    """Save JSONL output to a file."""
-    if not jsonl_output or jsonl_output.startswith("Error") or jsonl_output.startswith("Please"):
-        return None, "No valid output to save"
-    
+# Reused by the stdlib fallback, as in rag_builder
+_ENCODE = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), check_circular=False,
+                           default=json_default).encode
+
+def _dumps_item(item):
+    """Serialize one chunk to JSON bytes; orjson handles numpy embeddings natively."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(item, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return _ENCODE(item).encode("utf-8")
+
+_EMBEDDING_CACHE = None
+
+@functools.lru_cache(maxsize=4)
+def _get_embedder(embedding_model):
+    """
+    Return a shared EmbeddingGenerator per model, built on first use.
+    Accepts a MODEL_CONFIGS key (as offered in the dropdowns) or a model name.
+    """
+    embedding_utils, _ = _load_embedding_utils()
+    configs = embedding_utils.MODEL_CONFIGS
+    return embedding_utils.EmbeddingGenerator(configs.get(embedding_model, {}).get("name", embedding_model))
+
+def _warm_embedder(embedding_model):
+    if _load_embedding_utils() is not None:
+        _get_embedder(embedding_model)
+
+@functools.lru_cache(maxsize=1)
+def _preload_pool():
+    """Loads embedding models in the background while documents are being extracted."""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed-preload")
+
+def preload_embedder(embedding_model):
+    """
+    Start loading ``embedding_model`` on a background thread.
+    EmbeddingGenerator caches loaded models, so a later _get_embedder call for
+    the same model waits for this load instead of starting its own.
+    """
+    # The embedding stack itself is imported on the worker too, not the caller
+    _preload_pool().submit(_warm_embedder, embedding_model)
+
+def preload_if_enabled(enabled, embedding_model):
+    """Checkbox/dropdown handler: preload ``embedding_model`` when embeddings are enabled."""
+    if enabled:
+        preload_embedder(embedding_model)
+
+def embed_chunks(chunks, embedding_model):
+    """
+    Embed chunk texts through the persistent embedding cache, embedding each
+    distinct text once. Returns None (after printing a warning) if embeddings
+    can't be generated.
+    """
+    global _EMBEDDING_CACHE
+    loaded = _load_embedding_utils()
+    if loaded is None:
+        return None
+    _, embedding_cache = loaded
     try:
-        # Validate that we have valid JSONL content
-        lines = jsonl_output.strip().split('\n')
-        valid_lines = []
-        
-        for line in lines:
-            line = line.strip()
-            if line:
-                try:
-                    # Try to parse as JSON to validate
-                    json.loads(line)
-                    valid_lines.append(line)
-                except json.JSONDecodeError:
-                    print(f"Warning: Skipping invalid JSON line: {line[:100]}...")
-                    continue
-        
-        if not valid_lines:
-            return None, f"No valid JSONL content found. Found {len(lines)} lines but none were valid JSON."
-        
-        # Create output directory if it doesn't exist
-        output_dir = Path("out")
-        output_dir.mkdir(exist_ok=True)
+        if _EMBEDDING_CACHE is None:
+            _EMBEDDING_CACHE = embedding_cache.EmbeddingCache()
+        generator = embedding_cache.CachedEmbeddingGenerator(_get_embedder(embedding_model), _EMBEDDING_CACHE)
+        # Repeated boilerplate chunks are embedded once and fanned back out
+        unique = {}
+        index = [unique.setdefault(c, len(unique)) for c in chunks]
+        if not unique:
+            return None
+        vectors = generator.generate_embeddings(list(unique))
+        return vectors[index]
+    except Exception as e:
+        print(f"Warning: Could not generate embeddings: {e}")
+        return None
+
+def _maybe_quantize(embeddings, quantize):
+    """Return (embeddings, scales): int8 codes and per-vector scales when quantizing."""
+    if embeddings is None or not quantize:
+        return embeddings, None
+    embedding_utils, _ = _load_embedding_utils()
+    return embedding_utils.quantize_embeddings_int8(embeddings)
+
+@functools.lru_cache(maxsize=1)
+def _io_pool():
+    """Background writer threads for the Markdown saves."""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="save-io")
+
+def _iter_blocks(pieces, block_bytes=1 << 20):
+    """Group encoded pieces into blocks of at least ``block_bytes`` bytes."""
+    buf, size = [], 0
+    for piece in pieces:
+        buf.append(piece)
+        size += len(piece)
+        if size >= block_bytes:
+            yield b"".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield b"".join(buf)
+
+def _write_pipelined(path, blocks):
+    """
+    Write byte blocks to ``path`` on the I/O pool. Each write overlaps with
+    producing the next block; at most one write is in flight so order is kept.
+    """
+    with open(path, 'wb') as f:
+        pending = None
+        for block in blocks:
+            if pending is not None:
+                pending.result()
+            pending = _io_pool().submit(f.write, block)
+        if pending is not None:
+            pending.result()
+
+def _join_values(values):
+    """Comma-join a metadata list; lists of strings (e.g. tags) skip the str() pass."""
+    try:
+        return ', '.join(values)
+    except TypeError:
+        return ', '.join(map(str, values))
+
+def _markdown_pieces(chunks, title, now):
+    """Yield the Markdown text of a save: the header, then one string per chunk section."""
+    yield (f"# {title}\n\n"
+           f"*Generated on: {now.strftime('%Y-%m-%d %H:%M:%S')}*\n"
+           f"*Total chunks: {len(chunks)}*\n\n")
+    
+    for i, chunk in enumerate(chunks, 1):
+        parts = [f"## Chunk {i}\n\n"]
         
-        # Generate filename if not provided
-        if not filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"processed_chunks_{timestamp}.jsonl"
+        # Add content (check both 'text' and 'content' fields)
+        content = chunk.get('text', chunk.get('content', ''))
+        if content:
+            parts.append(f"**Content:**\n\n{content}\n\n")
         
-        # Ensure .jsonl extension
-        if not filename.endswith('.jsonl'):
-            filename += '.jsonl'
+        # Add metadata
+        metadata = chunk.get('metadata', {})
+        if metadata:
+            parts.append("**Metadata:**\n")
+            for key, value in metadata.items():
+                if isinstance(value, list):
+                    parts.append(f"- **{key}:** {_join_values(value)}\n")
+                else:
+                    parts.append(f"- **{key}:** {value}\n")
+            parts.append("\n")
         
-        filepath = output_dir / filename
+        # Add embeddings info if present
+        if 'embedding' in chunk:
+            embedding = chunk['embedding']
+            # numpy rows come from the in-memory save path, lists from parsed JSONL;
+            # duck-typed so numpy stays an optional dependency here
+            if hasattr(embedding, "shape"):
+                dims = embedding.shape[-1] if embedding.ndim else 0
+            elif isinstance(embedding, (list, tuple)):
+                dims = len(embedding)
+            else:
+                dims = 0
+            if dims > 0:
+                parts.append(f"**Embedding:** Vector with {dims} dimensions\n\n")
+            else:
+                parts.append("**Embedding:** [Vector data available]\n\n")
         
-        # Write the JSONL content
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(valid_lines))
+        # Add chunk info
+        if 'id' in chunk:
+            parts.append(f"**Chunk ID:** {chunk['id']}\n\n")
         
-        return str(filepath), f"✅ Saved {len(valid_lines)} chunks to {filepath}"
+        parts.append("---\n\n")
+        # One piece per chunk keeps the per-piece encode/append overhead low
+        yield "".join(parts)
+
+def _output_path(filename, ext, now=None):
+    """
+    Return out/<filename> (creating out/), defaulting to a processed_chunks name
+    stamped with ``now`` (or the current time) and making sure it ends with ``ext``.
+    """
+    # Create output directory if it doesn't exist
+    output_dir = Path("out")
+    output_dir.mkdir(exist_ok=True)
     
-    except Exception as e:
-        return None, f"❌ Error saving file: {str(e)}"
+    # Generate filename if not provided
+    if not filename:
+        timestamp = (now or datetime.now()).strftime("%Y%m%d_%H%M%S")
+        filename = f"processed_chunks_{timestamp}{ext}"
+    
+    if not filename.endswith(ext):
+        filename += ext
+    
+    return output_dir / filename
 
-def save_as_markdown(jsonl_output, filename=None):
-    """Convert JSONL output to Markdown format and save."""
-    if not jsonl_output or jsonl_output.startswith("Error") or jsonl_output.startswith("Please"):
+def save_as_markdown_from_items(chunks, filename=None):
+    """Save chunk dicts (as built by ``build_items_iter``) as Markdown."""
+    if not chunks:
         return None, "No valid output to save"
     
     try:
-        # Parse JSONL content
-        chunks = []
-        lines = jsonl_output.strip().split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if line:
-                try:
-                    chunk = json.loads(line)
-                    chunks.append(chunk)
-                except json.JSONDecodeError as e:
-                    # If it's not valid JSON, it might be a single chunk or error message
-                    print(f"Warning: Could not parse line as JSON: {line[:100]}...")
-                    continue
-        
-        if not chunks:
-            return None, f"No valid chunks to convert. Found {len(lines)} lines but couldn't parse any as JSON."
-        
-        # Create output directory if it doesn't exist
-        output_dir = Path("out")
-        output_dir.mkdir(exist_ok=True)
-        
-        # Generate filename if not provided
-        if not filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"processed_chunks_{timestamp}.md"
-        
-        # Ensure .md extension
-        if not filename.endswith('.md'):
-            filename += '.md'
-        
-        filepath = output_dir / filename
-        
-        # Convert to Markdown
-        markdown_content = []
+        # One timestamp for both the default filename and the header
+        now = datetime.now()
+        filepath = _output_path(filename, '.md', now)
         
         # Get title from first chunk or use default
         title = "Processed Document"
         if chunks and 'metadata' in chunks[0]:
             title = chunks[0]['metadata'].get('title', title)
         
-        markdown_content.append(f"# {title}")
-        markdown_content.append("")
-        markdown_content.append(f"*Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*")
-        markdown_content.append(f"*Total chunks: {len(chunks)}*")
-        markdown_content.append("")
-        
-        for i, chunk in enumerate(chunks, 1):
-            markdown_content.append(f"## Chunk {i}")
-            markdown_content.append("")
-            
-            # Add content (check both 'text' and 'content' fields)
-            content = chunk.get('text', chunk.get('content', ''))
-            if content:
-                markdown_content.append("**Content:**")
-                markdown_content.append("")
-                markdown_content.append(content)
-                markdown_content.append("")
-            
-            # Add metadata
-            metadata = chunk.get('metadata', {})
-            if metadata:
-                markdown_content.append("**Metadata:**")
-                for key, value in metadata.items():
-                    if isinstance(value, list):
-                        markdown_content.append(f"- **{key}:** {', '.join(str(v) for v in value)}")
-                    else:
-                        markdown_content.append(f"- **{key}:** {value}")
-                markdown_content.append("")
-            
-            # Add embeddings info if present
-            if 'embedding' in chunk:
-                embedding = chunk['embedding']
-                if isinstance(embedding, list) and len(embedding) > 0:
-                    markdown_content.append(f"**Embedding:** Vector with {len(embedding)} dimensions")
-                else:
-                    markdown_content.append("**Embedding:** [Vector data available]")
-                markdown_content.append("")
-            
-            # Add chunk info
-            if 'id' in chunk:
-                markdown_content.append(f"**Chunk ID:** {chunk['id']}")
-                markdown_content.append("")
-            
-            markdown_content.append("---")
-            markdown_content.append("")
-        
-        # Write the Markdown content
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(markdown_content))
+        # Render ~1 MB blocks here while the previous block is written in the background
+        pieces = (piece.encode('utf-8') for piece in _markdown_pieces(chunks, title, now))
+        _write_pipelined(filepath, _iter_blocks(pieces))
         
         return str(filepath), f"✅ Saved {len(chunks)} chunks to {filepath}"
     
     except Exception as e:
         return None, f"❌ Error saving file: {str(e)}"
 
-def process_text(text, section, slug, title, jurisdiction, doc_type, version, eff_date, rev_date, owner, tags, chunk_size, overlap, generate_embeddings, embedding_model):
-    """Process text input and return JSONL chunks."""
+def iter_jsonl_lines(base_meta, section, chunks, embeddings=None, embedding_scales=None):
+    """
+    Yield the JSONL line of each chunk, equal to serializing ``build_items_iter``
+    output, without building a dict per chunk.
+    The metadata shared by every chunk is serialized once as a byte template and
+    only the id, text, chunk_index and embedding are encoded per line.
+    With ``embedding_scales`` the embeddings are int8 codes and are written as
+    "embedding_q8" plus "embedding_scale" instead of "embedding".
+    """
+    if "chunk_index" in base_meta or "updated" in base_meta:
+        # Those keys would keep their front-matter position; use the general path
+        items = build_items_iter("", base_meta, section, chunks=chunks, embeddings=embeddings)
+        for i, it in enumerate(items):
+            if embedding_scales is not None and "embedding" in it:
+                it["embedding_q8"] = it.pop("embedding")
+                it["embedding_scale"] = float(embedding_scales[i])
+            yield _dumps_item(it)
+        return
+    
+    slug = base_meta.get('slug', 'doc')
+    shared = _dumps_item({**base_meta, "section": section})
+    meta_head = (shared[:-1] + b',' if shared != b'{}' else b'{') + b'"chunk_index":'
+    meta_tail = b',"updated":' + _dumps_item(str(date.today())) + b'}'
+    
+    for i, ch in enumerate(chunks, 1):
+        line = b"".join((
+            b'{"id":', _dumps_item(f"{slug}:{section}:{i:03}"),
+            b',"text":', _dumps_item(ch),
+            b',"metadata":', meta_head, str(i).encode(), meta_tail,
+        ))
+        if embeddings is not None and i <= len(embeddings):
+            if embedding_scales is not None:
+                line += (b',"embedding_q8":' + _dumps_item(embeddings[i-1]) +
+                         b',"embedding_scale":' + _dumps_item(float(embedding_scales[i-1])))
+            else:
+                line += b',"embedding":' + _dumps_item(embeddings[i-1])
+        yield line + b'}'
+
+@functools.lru_cache(maxsize=1)
+def _output_tmpdir():
+    """
+    Directory for the downloadable JSONL files, created on first use and
+    removed with everything in it when the process exits.
+    """
+    tmp = tempfile.TemporaryDirectory(prefix="rag_chunks_")
+    atexit.register(tmp.cleanup)
+    return tmp.name
+
+def stream_output(lines, batch_size=64, preview_lines=10):
+    """
+    Write serialized JSONL lines to a .jsonl file in ``_output_tmpdir``, yielding
+    (file_path, preview, count). Progress updates come every ``batch_size``
+    lines with no file yet; the last update carries the finished file. Only the
+    first ``preview_lines`` chunks are sent to the browser as text.
+    """
+    preview, count = [], 0
+    with tempfile.NamedTemporaryFile("wb", prefix="rag_chunks_", suffix=".jsonl",
+                                     dir=_output_tmpdir(), delete=False) as f:
+        for line in lines:
+            f.write(line)
+            f.write(b"\n")
+            count += 1
+            if count <= preview_lines:
+                preview.append(line.decode("utf-8"))
+            if count % batch_size == 0:
+                yield None, _format_preview(preview, count), count
+    yield f.name, _format_preview(preview, count), count
+
+def _stream_jsonl_to_path(lines, path, preview_lines=20):
+    """
+    Write serialized JSONL lines straight to ``path`` through one large buffer,
+    returning (preview, count) with the first ``preview_lines`` lines as text.
+    """
+    preview, count = [], 0
+    with open(path, 'wb', buffering=1 << 20) as f:
+        for line in lines:
+            f.write(line)
+            f.write(b"\n")
+            count += 1
+            if count <= preview_lines:
+                preview.append(line.decode("utf-8"))
+    return preview, count
+
+def save_output_lines(lines, preview_lines=20):
+    """Save serialized JSONL lines to out/, returning (file_path, preview, count)."""
+    output_dir = Path("out")
+    output_dir.mkdir(exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filepath = output_dir / f"processed_chunks_{timestamp}.jsonl"
+    preview, count = _stream_jsonl_to_path(lines, filepath, preview_lines)
+    return str(filepath), _format_preview(preview, count), count
+
+def _format_preview(preview, count):
+    text = "\n".join(preview)
+    if count > len(preview):
+        text += f"\n... {count - len(preview)} more chunks in the downloadable file"
+    return text
+
+def save_output_as_jsonl(path):
+    """
+    Save button handler: save a processed output file to out/, returning the status.
+    The file is already newline-terminated JSONL, so its bytes are copied as-is.
+    """
+    if not path:
+        return "No valid output to save"
+    try:
+        payload = Path(path).read_bytes()
+        count = payload.count(b'\n')
+        if not count:
+            return "No valid output to save"
+        filepath = _output_path(None, '.jsonl')
+        filepath.write_bytes(payload)
+        return f"✅ Saved {count} chunks to {filepath}"
+    except Exception as e:
+        return f"❌ Error saving file: {str(e)}"
+
+def save_items_as_markdown(source):
+    """
+    Save button handler: rebuild the chunk dicts from the processors' item
+    source (see ``_item_source``) and save them as Markdown, returning the status.
+    """
+    if not source:
+        return "No valid output to save"
+    return save_as_markdown_from_items(list(build_items_iter("", **source)))[1]
+
+def _item_source(base_meta, section, chunks, embeddings, scales):
+    """
+    The arguments ``build_items_iter`` needs to recreate a run's chunk dicts.
+    Quantized codes are left out, matching the Markdown of the saved JSONL.
+    """
+    return {"base_meta": base_meta, "section": section, "chunks": chunks,
+            "embeddings": embeddings if scales is None else None}
+
+def _attach_source(updates, source):
+    """Add the item source to the final (file-carrying) update of a processing stream."""
+    for path, preview, count in updates:
+        yield path, preview, count, (source if path else None)
+
+# The compiled linear walk beats bisecting in Python; without numba, bisect.
+# find_spec only: numba is imported when the first document is chunked
+_SEARCH_STRATEGY = "linear" if importlib.util.find_spec("numba") is not None else "binary"
+
+# Recent chunkings keyed by (body digest, chunk_size, overlap), most recent last;
+# keying on a digest keeps whole document bodies out of the cache
+_CHUNK_CACHE = OrderedDict()
+_CHUNK_CACHE_SIZE = 8
+_CHUNK_CACHE_LOCK = threading.Lock()
+
+def _chunk_cached(body, chunk_size, overlap):
+    """
+    Chunk ``body``, remembering recent results so re-running a document with
+    only metadata changes skips tokenization. Embeddings for the chunks come
+    from the persistent embedding cache.
+    """
+    key = (hashlib.blake2b(body.encode("utf-8"), digest_size=16).digest(), chunk_size, overlap)
+    with _CHUNK_CACHE_LOCK:
+        chunks = _CHUNK_CACHE.get(key)
+        if chunks is not None:
+            _CHUNK_CACHE.move_to_end(key)
+            return chunks
+    chunks = tuple(make_chunks(body, chunk_size, overlap, search_strategy=_SEARCH_STRATEGY))
+    with _CHUNK_CACHE_LOCK:
+        _CHUNK_CACHE[key] = chunks
+        if len(_CHUNK_CACHE) > _CHUNK_CACHE_SIZE:
+            _CHUNK_CACHE.popitem(last=False)
+    return chunks
+
+# Documents with YAML front matter open with this delimiter
+_FM_PREFIX = '---'
+
+def _has_front_matter(text):
+    """
+    True if ``text`` opens a front-matter block that is also closed, i.e. when
+    ``parse_front_matter`` would find one; other text skips the parser.
+    """
+    return text.startswith(_FM_PREFIX) and text.find(_FM_PREFIX, len(_FM_PREFIX)) >= 0
+
+# Front-matter defaults shared by the text and file handlers; read-only so a
+# handler can't leak changes into later requests
+_DEFAULT_META = MappingProxyType({
+    "title": "Untitled Document",
+    "slug": "untitled",
+    "jurisdiction": "GB",
+    "doc_type": "guidance",
+    "version": "1.0",
+    "effective_date": "",
+    "review_date": "",
+    "owner": "Document Owner",
+    "source_url": "",
+    "tags": [],
+})
+
+_TAG_RE = re.compile(r"\s*,\s*")
+
+@functools.lru_cache(maxsize=256)
+def _split_tags(tags):
+    """Parse a comma-separated tags string; the same few strings recur across requests."""
+    return tuple(t for t in _TAG_RE.split(tags.strip()) if t)
+
+def _form_meta(defaults, tags, **fields):
+    """Overlay the non-empty form fields and parsed tags on a copy of ``defaults``."""
+    meta = dict(defaults)
+    meta.update((k, v) for k, v in fields.items() if v)
+    meta["tags"] = list(_split_tags(tags or ""))
+    return meta
+
+def _read_text(path):
+    """
+    Read a UTF-8 text file as bytes and decode it in one go, which is faster
+    than text-mode reads; newlines are normalized as text mode would.
+    """
+    with open(path, 'rb') as f:
+        text = f.read().decode('utf-8')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+def _read_text_streaming(path, chunk_bytes=1 << 20):
+    """Yield a UTF-8 text file in blocks of about ``chunk_bytes`` characters."""
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                return
+            yield block
+
+def process_text(text, section, slug, title, jurisdiction, doc_type, version, eff_date, rev_date, owner, tags, chunk_size, overlap, generate_embeddings, embedding_model, quantize_embeddings=False, save=False):
+    """
+    Process text input, streaming progress and returning a JSONL file plus preview.
+    The final update also carries the item source used for Markdown saves.
+
+    With ``save`` the JSONL is written straight to out/ instead of a temporary file.
+    """
     if not text.strip():
-        return "Please enter some text.", 0
+        yield None, "Please enter some text.", 0, None
+        return
     
     try:
         # Parse front matter if present
-        if text.startswith('---'):
+        if _has_front_matter(text):
             fm, body = parse_front_matter(text)
         else:
             fm, body = {}, text
         
         # Set up metadata
-        fm_default = {
-            "title": title or "Untitled Document",
-            "slug": slug or "untitled",
-            "jurisdiction": jurisdiction or "GB",
-            "doc_type": doc_type or "guidance",
-            "version": version or "1.0",
-            "effective_date": eff_date or "",
-            "review_date": rev_date or "",
-            "owner": owner or "Document Owner",
-            "source_url": "",
-            "tags": [t.strip() for t in (tags or "").split(",") if t.strip()],
-        }
+        fm_default = _form_meta(_DEFAULT_META, tags, title=title, slug=slug,
+                                jurisdiction=jurisdiction, doc_type=doc_type, version=version,
+                                effective_date=eff_date, review_date=rev_date, owner=owner)
         
-        base_meta = {**fm_default, **fm}
+        # Front matter wins; update in place instead of merging into a new dict
+        base_meta = fm_default
+        base_meta.update(fm)
         section = section or fm.get("section", "Main")
         
-        # Build chunks
-        items = build_items(body, base_meta, section, chunk_size, overlap,
-                           generate_embeddings, embedding_model)
+        # Build chunks; chunk once so embeddings can be looked up per chunk in the cache
+        chunks = _chunk_cached(body, chunk_size, overlap)
+        embeddings = embed_chunks(chunks, embedding_model) if generate_embeddings else None
+        embeddings, scales = _maybe_quantize(embeddings, quantize_embeddings)
         
         # Convert to JSONL
-        jsonl = "\n".join(json.dumps(it, ensure_ascii=False) for it in items)
-        return jsonl, len(items)
+        lines = iter_jsonl_lines(base_meta, section, chunks, embeddings, scales)
+        updates = [save_output_lines(lines)] if save else stream_output(lines)
+        yield from _attach_source(updates, _item_source(base_meta, section, chunks, embeddings, scales))
     
     except Exception as e:
-        return f"Error processing text: {str(e)}", 0
+        yield None, f"Error processing text: {str(e)}", 0, None
 
-def process_file(file, section, slug, title, jurisdiction, doc_type, version, eff_date, rev_date, owner, tags, chunk_size, overlap, generate_embeddings, embedding_model):
-    """Process uploaded file and return JSONL chunks."""
+def process_file(file, section, slug, title, jurisdiction, doc_type, version, eff_date, rev_date, owner, tags, chunk_size, overlap, generate_embeddings, embedding_model, quantize_embeddings=False, save=False):
+    """
+    Process uploaded file, streaming progress and returning a JSONL file plus preview.
+    The final update also carries the item source used for Markdown saves.
+
+    With ``save`` the JSONL is written straight to out/ instead of a temporary file.
+    """
     if file is None:
-        return "Please upload a file.", 0
+        yield None, "Please upload a file.", 0, None
+        return
     
     try:
-        if DOCUMENT_PROCESSOR_AVAILABLE:
-            processor = DocumentProcessor()
-            if processor.can_process(file.name):
-                text, file_metadata = processor.extract_text(file.name)
-                text = clean_text(text)
-            else:
-                with open(file.name, 'r', encoding='utf-8') as f:
-                    text = f.read()
-                file_metadata = {}
+        # Overlap model loading with text extraction; chunking needs the whole
+        # document, so embedding itself can only start once extraction is done
+        if generate_embeddings:
+            preload_embedder(embedding_model)
+        
+        basename = os.path.basename(file.name)
+        stem, ext = os.path.splitext(basename)
+        is_markdown = ext.lower() == '.md'
+        processor, extract_and_clean = _load_document_processor()
+        if processor is not None and processor.can_process(file.name):
+            # Keeps a leading front-matter block intact; only the body is cleaned
+            text, file_metadata = extract_and_clean(file.name, processor)
+        elif is_markdown:
+            # Front matter has to be parsed from the complete text
+            text = _read_text(file.name)
+            file_metadata = {}
         else:
-            with open(file.name, 'r', encoding='utf-8') as f:
-                text = f.read()
+            # Plain-text fallback: sentences are split from the file as it is read
+            text = None
             file_metadata = {}
         
-        if file.name.lower().endswith('.md'):
+        # Only call the parser when a complete front-matter block is present
+        if text is None:
+            fm, body = {}, ""
+        elif is_markdown and _has_front_matter(text):
             fm, body = parse_front_matter(text)
         else:
             fm, body = {}, text
         
-        fm_default = {
-            "title": title or file_metadata.get("title", os.path.basename(file.name)),
-            "slug": slug or os.path.splitext(os.path.basename(file.name))[0],
-            "jurisdiction": jurisdiction or "GB",
-            "doc_type": doc_type or "guidance",
-            "version": version or "1.0",
-            "effective_date": eff_date or "",
-            "review_date": rev_date or "",
-            "owner": owner or "HSE-App",
-            "source_url": "",
-            "tags": [t.strip() for t in (tags or "").split(",") if t.strip()],
-            "source_format": file_metadata.get("format", "unknown"),
+        file_defaults = {
+            **_DEFAULT_META,
+            "title": file_metadata.get("title", basename),
+            "slug": stem,
+            "owner": "HSE-App",
         }
+        fm_default = _form_meta(file_defaults, tags, title=title, slug=slug,
+                                jurisdiction=jurisdiction, doc_type=doc_type, version=version,
+                                effective_date=eff_date, review_date=rev_date, owner=owner)
+        fm_default["source_format"] = file_metadata.get("format", "unknown")
         
-        base_meta = {**fm_default, **fm}
+        # Front matter wins; update in place instead of merging into a new dict
+        base_meta = fm_default
+        base_meta.update(fm)
         section = section or fm.get("section","Main")
         
-        items = build_items(body, base_meta, section, chunk_size, overlap,
-                           generate_embeddings, embedding_model)
+        # Chunk once so embeddings can be looked up per chunk in the cache
+        if text is None:
+            chunks = make_chunks_from_sentences(iter_sentences(_read_text_streaming(file.name)),
+                                                chunk_size, overlap, search_strategy=_SEARCH_STRATEGY)
+        else:
+            chunks = _chunk_cached(body, chunk_size, overlap)
+        embeddings = embed_chunks(chunks, embedding_model) if generate_embeddings else None
+        embeddings, scales = _maybe_quantize(embeddings, quantize_embeddings)
         
-        jsonl = "\n".join(json.dumps(it, ensure_ascii=False) for it in items)
-        return jsonl, len(items)
+        lines = iter_jsonl_lines(base_meta, section, chunks, embeddings, scales)
+        updates = [save_output_lines(lines)] if save else stream_output(lines)
+        yield from _attach_source(updates, _item_source(base_meta, section, chunks, embeddings, scales))
     
     except Exception as e:
-        return f"Error processing file: {str(e)}", 0
+        yield None, f"Error processing file: {str(e)}", 0, None
+
+def process_text_and_save(*args):
+    """Process + Save button handler: process text and write the JSONL to out/."""
+    yield from process_text(*args, save=True)
+
+def process_file_and_save(*args):
+    """Process + Save button handler: process a file and write the JSONL to out/."""
+    yield from process_file(*args, save=True)
+
+@functools.lru_cache(maxsize=1)
+def _batch_pool():
+    """Worker processes for batch uploads, started on first use and reused across batches."""
+    # Chunking is CPU-bound, so threads would serialize on the GIL; spawn rather
+    # than fork because the Gradio server process runs many threads. Workers run
+    # rag_builder.batch_chunk_file, so they don't need Gradio or the UI's pools
+    return ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                               mp_context=multiprocessing.get_context("spawn"))
+
+def process_batch(files):
+    """Process uploaded files in parallel worker processes, streaming a per-file status report."""
+    if not files:
+        yield "Please upload some files."
+        return
+    
+    report = []
+    results = {}
+    ex = _batch_pool()
+    futures = {}
+    for i, f in enumerate(files):
+        # Each worker writes its file's JSONL to a path picked here; only the
+        # paths and the chunk count cross the process boundary
+        fd, out_path = tempfile.mkstemp(prefix="rag_batch_", suffix=".jsonl", dir=_output_tmpdir())
+        os.close(fd)
+        futures[ex.submit(batch_chunk_file, f.name, out_path)] = (i, out_path)
+    for future in as_completed(futures):
+        i, out_path = futures[future]
+        name = os.path.basename(files[i].name)
+        try:
+            count = future.result()
+        except BrokenProcessPool as e:
+            # A worker died; start a fresh pool for the next batch
+            _batch_pool.cache_clear()
+            report.append(f"❌ {name}: Error processing file: {e}")
+        except Exception as e:
+            report.append(f"❌ {name}: Error processing file: {e}")
+        else:
+            report.append(f"✅ {name}: {count} chunks")
+            results[i] = (out_path, count)
+        yield "\n".join(report)
+    
+    # Combine the outputs in upload order, not completion order
+    combined = [results[i][0] for i in sorted(results) if results[i][1]]
+    if combined:
+        output_dir = Path("out")
+        output_dir.mkdir(exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filepath = output_dir / f"batch_chunks_{timestamp}.jsonl"
+        with open(filepath, 'wb') as out:
+            for path in combined:
+                with open(path, 'rb') as f:
+                    shutil.copyfileobj(f, out)
+        report.append(f"\n💾 Saved combined output to {filepath}")
+    for _, out_path in futures.values():
+        os.remove(out_path)
+    report.append(f"📊 Processed {len(results)}/{len(files)} files")
+    yield "\n".join(report)
 
 def get_embedding_models():
     """Get available embedding models."""
-    if EMBEDDING_AVAILABLE:
-        return list(MODEL_CONFIGS.keys())
-    return ["fast"]  # Default fallback
+    return list(_EMBED_MODELS)
+
+def processing_concurrency():
+    """
+    How many processing jobs may run at once: 2 when embeddings can run on a
+    GPU, otherwise half the CPU cores. Decided without importing torch: a GPU
+    counts when torch is installed and the NVIDIA driver tools are on PATH.
+    """
+    if importlib.util.find_spec("torch") is not None and shutil.which("nvidia-smi") is not None:
+        return 2
+    return max(1, (os.cpu_count() or 2) // 2)
 
 def create_demo():
     """Create the Gradio demo interface."""
+    # Imported here so the spawned batch workers, which re-run this module as
+    # their __main__ when the UI is started as a script, don't import Gradio
+    import gradio as gr
     
     # Get embedding models
     embedding_models = get_embedding_models()
     
+    # Text, file and batch processing share one concurrency group so parallel
+    # requests don't oversubscribe the embedding model
+    concurrency = processing_concurrency()
+    
     with gr.Blocks(theme=gr.themes.Soft()) as demo:
         gr.Markdown("# 📄 RAG Document Processor")
         gr.Markdown("Transform your documents into RAG-ready chunks with rich metadata.")
@@ -336,21 +759,32 @@ def create_demo():
                             label="Generate Embeddings",
                             value=False
                         )
+                        quantize_embeddings = gr.Checkbox(
+                            label="Quantize embeddings (int8)",
+                            value=False
+                        )
                         embedding_model = gr.Dropdown(
                             choices=embedding_models,
                             value=embedding_models[0],
                             label="Embedding Model"
                         )
                 
-                process_btn = gr.Button("🔄 Process Text", variant="primary")
+                with gr.Row():
+                    process_btn = gr.Button("🔄 Process Text", variant="primary")
+                    process_save_btn = gr.Button("💾 Process + Save", variant="primary")
                 
                 with gr.Row():
                     output_text = gr.Textbox(
-                        label="JSONL Output",
+                        label="Preview",
                         lines=10,
-                        placeholder="Processed chunks will appear here..."
+                        placeholder="The first processed chunks will appear here..."
                     )
-                    chunk_count = gr.Number(label="Chunks Generated", value=0)
+                    with gr.Column():
+                        output_file = gr.File(label="JSONL Output", interactive=False)
+                        chunk_count = gr.Number(label="Chunks Generated", value=0)
+                
+                # Lets Markdown saves rebuild the chunk dicts instead of re-parsing JSONL
+                items_state = gr.State(None)
                 
                 # Save buttons for text processing
                 with gr.Row():
@@ -368,21 +802,44 @@ def create_demo():
                     inputs=[
                         text_input, section, slug, title, jurisdiction, doc_type,
                         version, eff_date, rev_date, owner, tags, chunk_size, overlap,
-                        generate_embeddings, embedding_model
+                        generate_embeddings, embedding_model, quantize_embeddings
+                    ],
+                    outputs=[output_file, output_text, chunk_count, items_state],
+                    concurrency_limit=concurrency,
+                    concurrency_id="processing"
+                )
+                
+                process_save_btn.click(
+                    fn=process_text_and_save,
+                    inputs=[
+                        text_input, section, slug, title, jurisdiction, doc_type,
+                        version, eff_date, rev_date, owner, tags, chunk_size, overlap,
+                        generate_embeddings, embedding_model, quantize_embeddings
                     ],
-                    outputs=[output_text, chunk_count]
+                    outputs=[output_file, output_text, chunk_count, items_state],
+                    concurrency_limit=concurrency,
+                    concurrency_id="processing"
                 )
                 
+                # Warm the chosen model once embeddings are switched on, so the
+                # first embedding request doesn't pay for loading it
+                for trigger in (generate_embeddings, embedding_model):
+                    trigger.change(
+                        fn=preload_if_enabled,
+                        inputs=[generate_embeddings, embedding_model],
+                        outputs=None
+                    )
+                
                 # Save button event handlers
                 save_jsonl_btn.click(
-                    fn=save_as_jsonl,
-                    inputs=[output_text],
+                    fn=save_output_as_jsonl,
+                    inputs=[output_file],
                     outputs=[save_status]
                 )
                 
                 save_md_btn.click(
-                    fn=save_as_markdown,
-                    inputs=[output_text],
+                    fn=save_items_as_markdown,
+                    inputs=[items_state],
                     outputs=[save_status]
                 )
             
@@ -432,21 +889,32 @@ def create_demo():
                             label="Generate Embeddings",
                             value=False
                         )
+                        file_quantize_embeddings = gr.Checkbox(
+                            label="Quantize embeddings (int8)",
+                            value=False
+                        )
                         file_embedding_model = gr.Dropdown(
                             choices=embedding_models,
                             value=embedding_models[0],
                             label="Embedding Model"
                         )
                 
-                file_process_btn = gr.Button("🔄 Process File", variant="primary")
+                with gr.Row():
+                    file_process_btn = gr.Button("🔄 Process File", variant="primary")
+                    file_process_save_btn = gr.Button("💾 Process + Save", variant="primary")
                 
                 with gr.Row():
                     file_output_text = gr.Textbox(
-                        label="JSONL Output",
+                        label="Preview",
                         lines=10,
-                        placeholder="Processed chunks will appear here..."
+                        placeholder="The first processed chunks will appear here..."
                     )
-                    file_chunk_count = gr.Number(label="Chunks Generated", value=0)
+                    with gr.Column():
+                        file_output_file = gr.File(label="JSONL Output", interactive=False)
+                        file_chunk_count = gr.Number(label="Chunks Generated", value=0)
+                
+                # Lets Markdown saves rebuild the chunk dicts instead of re-parsing JSONL
+                file_items_state = gr.State(None)
                 
                 # Save buttons for file processing
                 with gr.Row():
@@ -465,21 +933,45 @@ def create_demo():
                         file_input, file_section, file_slug, file_title, file_jurisdiction,
                         file_doc_type, file_version, file_eff_date, file_rev_date,
                         file_owner, file_tags, file_chunk_size, file_overlap,
-                        file_generate_embeddings, file_embedding_model
+                        file_generate_embeddings, file_embedding_model, file_quantize_embeddings
+                    ],
+                    outputs=[file_output_file, file_output_text, file_chunk_count, file_items_state],
+                    concurrency_limit=concurrency,
+                    concurrency_id="processing"
+                )
+                
+                file_process_save_btn.click(
+                    fn=process_file_and_save,
+                    inputs=[
+                        file_input, file_section, file_slug, file_title, file_jurisdiction,
+                        file_doc_type, file_version, file_eff_date, file_rev_date,
+                        file_owner, file_tags, file_chunk_size, file_overlap,
+                        file_generate_embeddings, file_embedding_model, file_quantize_embeddings
                     ],
-                    outputs=[file_output_text, file_chunk_count]
+                    outputs=[file_output_file, file_output_text, file_chunk_count, file_items_state],
+                    concurrency_limit=concurrency,
+                    concurrency_id="processing"
                 )
                 
+                # Warm the chosen model once embeddings are switched on, so the
+                # first embedding request doesn't pay for loading it
+                for trigger in (file_generate_embeddings, file_embedding_model):
+                    trigger.change(
+                        fn=preload_if_enabled,
+                        inputs=[file_generate_embeddings, file_embedding_model],
+                        outputs=None
+                    )
+                
                 # Save button event handlers for file processing
                 file_save_jsonl_btn.click(
-                    fn=save_as_jsonl,
-                    inputs=[file_output_text],
+                    fn=save_output_as_jsonl,
+                    inputs=[file_output_file],
                     outputs=[file_save_status]
                 )
                 
                 file_save_md_btn.click(
-                    fn=save_as_markdown,
-                    inputs=[file_output_text],
+                    fn=save_items_as_markdown,
+                    inputs=[file_items_state],
                     outputs=[file_save_status]
                 )
             
@@ -502,11 +994,18 @@ def create_demo():
                 )
                 
                 batch_process_btn.click(
-                    fn=lambda x: "Batch processing coming soon!",
+                    fn=process_batch,
                     inputs=[batch_files],
-                    outputs=[batch_output]
+                    outputs=[batch_output],
+                    concurrency_limit=concurrency,
+                    concurrency_id="processing"
                 )
         
+        # Start loading the default embedding model when a page opens, so the
+        # first embedding request in any tab doesn't pay for it. The load runs on
+        # the preload thread; the handler only submits it and returns at once
+        demo.load(fn=lambda: preload_embedder(embedding_models[0]))
+        
         # Footer
         gr.Markdown("---")
         gr.Markdown("""
@@ -536,6 +1035,7 @@ def create_demo():
 
 if __name__ == "__main__":
     demo = create_demo()
+    demo.queue(max_size=32)
     demo.launch(
         server_name="127.0.0.1",  # Use localhost instead of 0.0.0.0
         server_port=7860,